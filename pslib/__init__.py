@@ -1,5 +1,9 @@
 __version__ = "0.0.6"
 
+from .capture import *
 from .client import *
 from .errors import *
 from .messages import *
+from .pool import *
+from .replay import *
+from .supervisor import *
@@ -0,0 +1,249 @@
+__all__ = ["Pokemon", "Side", "BattleSnapshot", "BattleState"]
+
+
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+
+from .messages import (
+    BATTLE_MESSAGE_REGISTRY,
+    WinMessage,
+    PlayerMessage,
+    TeamSizeMessage,
+    GameTypeMessage,
+    PokeMessage,
+    SwitchMessage,
+    DetailsChangeMessage,
+    DamageMessage,
+    HealMessage,
+    SetHpMessage,
+    StatusMessage,
+    CureStatusMessage,
+    FaintMessage,
+    TurnMessage,
+    WeatherMessage,
+)
+from .state import RoomState
+
+
+@dataclass(frozen=True)
+class Pokemon:
+    name: str
+    species: str = ""
+    details: str = ""
+    hp: int = 100
+    max_hp: int = 100
+    status: str = ""
+    fainted: bool = False
+
+
+@dataclass(frozen=True)
+class Side:
+    player: str = ""
+    username: str = ""
+    rating: Optional[int] = None
+    teamsize: int = 0
+    pokemon: Tuple[Pokemon, ...] = ()
+    active: Tuple[Optional[str], ...] = ()
+
+    def find(self, name, species=None):
+        for index, pokemon in enumerate(self.pokemon):
+            if pokemon.name == name:
+                return index
+
+        if species:
+            for index, pokemon in enumerate(self.pokemon):
+                if pokemon.name == pokemon.species and match_species(
+                    pokemon.species, species
+                ):
+                    return index
+
+        return -1
+
+    def get(self, name):
+        index = self.find(name)
+        return None if index < 0 else self.pokemon[index]
+
+    def update(self, name, **changes):
+        index = self.find(name, changes.get("species"))
+
+        if index < 0:
+            return replace(self, pokemon=(*self.pokemon, Pokemon(name, **changes)))
+
+        pokemon = replace(self.pokemon[index], name=name, **changes)
+        return replace(
+            self, pokemon=(*self.pokemon[:index], pokemon, *self.pokemon[index + 1 :])
+        )
+
+    def activate(self, slot, name):
+        active = self.active + (None,) * (slot + 1 - len(self.active))
+        return replace(self, active=(*active[:slot], name, *active[slot + 1 :]))
+
+
+@dataclass(frozen=True)
+class BattleSnapshot:
+    turn: int = 0
+    weather: str = ""
+    gametype: str = ""
+    sides: Tuple[Side, ...] = ()
+    winner: str = ""
+
+    def side(self, player):
+        for side in self.sides:
+            if side.player == player:
+                return side
+        return None
+
+    @property
+    def active(self):
+        return {
+            side.player: [side.get(name) if name else None for name in side.active]
+            for side in self.sides
+        }
+
+
+def match_species(preview, species):
+    if preview.endswith("-*"):
+        return species == preview[:-2] or species.startswith(preview[:-1])
+    return preview == species
+
+
+def parse_position(position):
+    ident, _, name = position.partition(": ")
+    player = ident[:2]
+    slot = ord(ident[2]) - ord("a") if len(ident) > 2 else None
+    return player, slot, name
+
+
+def parse_condition(condition):
+    hp, _, status = condition.partition(" ")
+    hp, _, max_hp = hp.partition("/")
+    changes = {"hp": int(hp), "status": "" if status == "fnt" else status}
+
+    if max_hp:
+        changes["max_hp"] = int(max_hp)
+    if status == "fnt" or changes["hp"] == 0:
+        changes["fainted"] = True
+
+    return changes
+
+
+class BattleState(RoomState):
+    registry = BATTLE_MESSAGE_REGISTRY
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.current = BattleSnapshot()
+        self.turns = {0: self.current}
+
+    def handle_message(self, message):
+        super().handle_message(message)
+
+        handler = BATTLE_HANDLERS.get(message.__class__)
+        if handler:
+            handler(self, message)
+
+    def snapshot(self, turn=None):
+        return self.current if turn is None else self.turns[turn]
+
+    def update_side(self, player, function, *args, **kwargs):
+        snapshot = self.current
+        sides = snapshot.sides
+
+        for index, side in enumerate(sides):
+            if side.player == player:
+                side = function(side, *args, **kwargs)
+                sides = (*sides[:index], side, *sides[index + 1 :])
+                break
+        else:
+            sides = (*sides, function(Side(player), *args, **kwargs))
+
+        self.current = replace(snapshot, sides=sides)
+
+    def update_pokemon(self, position, **changes):
+        player, _, name = parse_position(position)
+        self.update_side(player, Side.update, name, **changes)
+
+    def handle_player(self, message):
+        rating = int(message.rating) if message.rating.isdigit() else None
+        self.update_side(
+            message.player, replace, username=message.username, rating=rating
+        )
+
+    def handle_teamsize(self, message):
+        self.update_side(message.player, replace, teamsize=message.size)
+
+    def handle_gametype(self, message):
+        self.current = replace(self.current, gametype=message.gametype)
+
+    def handle_poke(self, message):
+        species = message.details.partition(",")[0]
+        self.update_side(
+            message.player,
+            Side.update,
+            species,
+            species=species,
+            details=message.details,
+        )
+
+    def handle_switch(self, message):
+        player, slot, name = parse_position(message.pokemon)
+        changes = {
+            "details": message.details,
+            "species": message.details.partition(",")[0],
+        }
+
+        if message.condition:
+            changes.update(parse_condition(message.condition))
+
+        if message.type == "detailschange" or message.type == "-formechange":
+            self.update_side(player, Side.update, name, **changes)
+        else:
+            self.update_side(
+                player,
+                lambda side: side.update(name, **changes).activate(slot or 0, name),
+            )
+
+    def handle_condition(self, message):
+        self.update_pokemon(message.pokemon, **parse_condition(message.condition))
+
+    def handle_status(self, message):
+        self.update_pokemon(message.pokemon, status=message.status)
+
+    def handle_curestatus(self, message):
+        self.update_pokemon(message.pokemon, status="")
+
+    def handle_faint(self, message):
+        self.update_pokemon(message.pokemon, hp=0, status="", fainted=True)
+
+    def handle_turn(self, message):
+        self.current = replace(self.current, turn=message.turn)
+        self.turns[message.turn] = self.current
+
+    def handle_weather(self, message):
+        weather = "" if message.weather == "none" else message.weather
+        self.current = replace(self.current, weather=weather)
+
+    def handle_win(self, message):
+        self.current = replace(self.current, winner=message.userid)
+
+
+BATTLE_HANDLERS = {
+    PlayerMessage: BattleState.handle_player,
+    TeamSizeMessage: BattleState.handle_teamsize,
+    GameTypeMessage: BattleState.handle_gametype,
+    PokeMessage: BattleState.handle_poke,
+    SwitchMessage: BattleState.handle_switch,
+    DetailsChangeMessage: BattleState.handle_switch,
+    DamageMessage: BattleState.handle_condition,
+    HealMessage: BattleState.handle_condition,
+    SetHpMessage: BattleState.handle_condition,
+    StatusMessage: BattleState.handle_status,
+    CureStatusMessage: BattleState.handle_curestatus,
+    FaintMessage: BattleState.handle_faint,
+    TurnMessage: BattleState.handle_turn,
+    WeatherMessage: BattleState.handle_weather,
+    WinMessage: BattleState.handle_win,
+}
+
+BattleState.needs = (*RoomState.needs, *BATTLE_HANDLERS)
@@ -0,0 +1,203 @@
+__all__ = ["CaptureWriter", "CaptureReader"]
+
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import asyncio
+import json
+import mmap
+import struct
+import time
+
+
+RECORD_HEADER = struct.Struct("<dHI")
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+
+
+def segment_path(directory, segment):
+    return directory / f"{segment:08d}{SEGMENT_SUFFIX}"
+
+
+class CaptureWriter:
+    def __init__(
+        self, directory, *, segment_size=64 * 1024 * 1024, flush_size=64 * 1024
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.flush_size = flush_size
+
+        existing = sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+        self.segment = int(existing[-1].stem) + 1 if existing else 0
+        self.offset = 0
+        self.index = defaultdict(list)
+        self.pending = bytearray()
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.futures = []
+        self.file = None
+        self.closed = False
+
+    def write(self, room_id, raw_line, timestamp=None):
+        room = room_id.encode()
+        line = raw_line.encode()
+        size = RECORD_HEADER.size + len(room) + len(line)
+
+        if self.offset and self.offset + size > self.segment_size:
+            self.rotate()
+
+        self.index[room_id].append(self.offset)
+        self.pending += RECORD_HEADER.pack(
+            time.time() if timestamp is None else timestamp, len(room), len(line)
+        )
+        self.pending += room
+        self.pending += line
+        self.offset += size
+
+        if len(self.pending) >= self.flush_size:
+            self.flush()
+
+    def submit(self, function, *args):
+        future = self.executor.submit(function, *args)
+        self.futures.append(future)
+        return future
+
+    def flush(self):
+        if self.pending:
+            data = bytes(self.pending)
+            self.pending.clear()
+            return self.submit(self._append, self.segment, data)
+
+    def rotate(self):
+        self.flush()
+        self.submit(self._finish, self.segment, dict(self.index))
+        self.segment += 1
+        self.offset = 0
+        self.index = defaultdict(list)
+
+    def check(self):
+        futures, self.futures = self.futures, []
+
+        for future in futures:
+            future.result()
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        futures, self.futures = self.futures, []
+
+        for future in futures:
+            await asyncio.wrap_future(future, loop=loop)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.offset:
+                self.rotate()
+            self.executor.shutdown(wait=True)
+            self.check()
+
+    async def aclose(self):
+        if not self.closed:
+            self.closed = True
+            if self.offset:
+                self.rotate()
+
+            try:
+                await self.wait()
+            finally:
+                self.executor.shutdown(wait=False)
+
+    async def run(self, interval=0.5):
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                self.flush()
+                await self.wait()
+        finally:
+            await self.aclose()
+
+    def _append(self, segment, data):
+        if self.file is None:
+            self.file = open(segment_path(self.directory, segment), "ab")
+        self.file.write(data)
+        self.file.flush()
+
+    def _finish(self, segment, index):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+        path = segment_path(self.directory, segment).with_suffix(INDEX_SUFFIX)
+        path.write_text(json.dumps(index))
+
+
+class CaptureReader:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def segments(self):
+        return sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def __iter__(self):
+        for path in self.segments():
+            yield from self.read_segment(path)
+
+    def index(self, path):
+        index_path = path.with_suffix(INDEX_SUFFIX)
+
+        if index_path.exists():
+            return json.loads(index_path.read_text())
+
+        index = defaultdict(list)
+        with self.open_segment(path) as data:
+            for offset, room_id in self.scan(data):
+                index[room_id].append(offset)
+        return index
+
+    def rooms(self):
+        return sorted(
+            {room_id for path in self.segments() for room_id in self.index(path)}
+        )
+
+    def room(self, room_id):
+        for path in self.segments():
+            if offsets := self.index(path).get(room_id):
+                with self.open_segment(path) as data:
+                    for offset in offsets:
+                        yield self.read_record(data, offset)[:3]
+
+    def read_segment(self, path):
+        with self.open_segment(path) as data:
+            offset = 0
+            while offset < len(data):
+                *record, offset = self.read_record(data, offset)
+                yield tuple(record)
+
+    def scan(self, data):
+        offset = 0
+        while offset < len(data):
+            _, room_length, line_length = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            yield offset, data[start : start + room_length].decode()
+            offset = start + room_length + line_length
+
+    def read_record(self, data, offset):
+        timestamp, room_length, line_length = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        middle = start + room_length
+        end = middle + line_length
+        return (
+            timestamp,
+            data[start:middle].decode(),
+            data[middle:end].decode(),
+            end,
+        )
+
+    def open_segment(self, path):
+        with open(path, "rb") as f:
+            if not f.seek(0, 2):
+                return memoryview(b"")
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
@@ -5,59 +5,130 @@ from contextlib import asynccontextmanager
 
 from .network import HttpContext, WebsocketContext
 from .message_managers import InboundMessageManager, OutboundMessageManager
-from .messages import parse_message
+from .messages import parse_message, split_message, UnrecognizedMessage
+from .presence import PresenceIndex
 from .rooms import RoomRegistry, Room
 from .state import ClientState
 from .utils import concurrent_tasks
 
 
 @asynccontextmanager
-async def connect(server="showdown", *, host=None, uri=None, sticky=True):
-    async with Client.connect(server, host=host, uri=uri, sticky=sticky) as client:
+async def connect(server="showdown", *, host=None, uri=None, sticky=True, **kwargs):
+    async with Client.connect(
+        server, host=host, uri=uri, sticky=sticky, **kwargs
+    ) as client:
         yield client
 
 
 class Client(Room):
-    def __init__(self, http, ws):
-        super().__init__(self, "", ClientState(maxlogs=100))
+    def __init__(
+        self,
+        http,
+        ws,
+        *,
+        pipelined=False,
+        lazy=False,
+        raw_logs=False,
+        batch_size=1,
+        batch_window=0,
+        room_policy=None,
+        demand_driven=False,
+        capture=None,
+    ):
+        super().__init__(self, "", ClientState(maxlogs=100, raw_logs=raw_logs))
 
         self.http = http
         self.ws = ws
+        self.lazy = lazy
+        self.demand_driven = demand_driven
+        self.demand = {}
+        self.capture = capture
 
-        self.rooms = RoomRegistry(self)
+        self.rooms = RoomRegistry(self, raw_logs=raw_logs, policy=room_policy)
         self.rooms["lobby"] = self
 
+        self.presence = PresenceIndex()
+
         self.received_messages = InboundMessageManager()
-        self.sent_messages = OutboundMessageManager()
+        self.sent_messages = OutboundMessageManager(
+            pipelined=pipelined, batch_size=batch_size, batch_window=batch_window
+        )
+
+        self.needs = (*PresenceIndex.needs, *OutboundMessageManager.needs)
 
     @classmethod
     @asynccontextmanager
-    async def connect(cls, server="showdown", *, host=None, uri=None, sticky=True):
+    async def connect(
+        cls, server="showdown", *, host=None, uri=None, sticky=True, **kwargs
+    ):
         async with HttpContext.create() as http:
             if uri is None:
                 uri = await http.resolve_server_uri(
                     server_id=server, server_host=host, sticky=sticky
                 )
             async with WebsocketContext.create(uri, sticky=sticky) as ws:
-                async with cls(http, ws).start() as client:
+                async with cls(http, ws, **kwargs).start() as client:
                     yield client
 
     @asynccontextmanager
     async def start(self):
-        async with concurrent_tasks(self._receive_messages(), self._send_messages()):
+        coroutines = [self._receive_messages(), self._send_messages()]
+
+        if self.rooms.policy:
+            coroutines.append(self.rooms.sweep())
+
+        if self.capture:
+            coroutines.append(self.capture.run())
+
+        async with concurrent_tasks(*coroutines):
             yield self
 
     async def _receive_messages(self):
-        async for room_id, raw_message in self.ws.receive_raw_messages():
+        async for room_id, payload, start, end in self.ws.receive_raw_spans():
+            if self.capture:
+                self.capture.write(room_id, payload[start:end])
+
             room = self.rooms[room_id]
 
-            message = parse_message(raw_message)
-            message.room = room
+            if self.demand_driven:
+                message_type, offset = split_message(payload, start, end)
+                cls = room.state.registry.get(message_type, UnrecognizedMessage)
+
+                if not self.wants(cls, room.state):
+                    room.skip_message(payload[start:end])
+                    continue
+
+                message = cls(message_type, payload[offset:end], room, self.lazy)
+            else:
+                message = parse_message(
+                    payload,
+                    room,
+                    lazy=self.lazy,
+                    registry=room.state.registry,
+                    start=start,
+                    end=end,
+                )
 
             room.handle_message(message)
+            self.presence.handle_message(message)
+
+            self.sent_messages.handle_message(message)
 
             self.received_messages.dispatch(message)
 
+            if self.received_messages.blocked:
+                await self.received_messages.drain()
+
+    def wants(self, message_class, state):
+        key = message_class, type(state)
+
+        if (wanted := self.demand.get(key)) is None:
+            wanted = self.demand[key] = issubclass(
+                message_class, (*self.needs, *state.needs)
+            )
+
+        return wanted or bool(self.received_messages.resolve(message_class))
+
     async def _send_messages(self):
-        async for raw_message in self.sent_messages.collect():
-            await self.ws.send_raw_message(raw_message)
+        async for raw_messages in self.sent_messages.collect_batches():
+            await self.ws.send_raw_messages(raw_messages)
@@ -1,10 +1,16 @@
 __all__ = ["GlobalCommandsMixin"]
 
 
+from collections import OrderedDict
+import asyncio
+import time
+
 from .messages import (
     UpdateUserMessage,
     PrivateMessage,
     QueryResponseMessage,
+    InitMessage,
+    NoInitMessage,
     DeinitMessage,
 )
 from .errors import (
@@ -57,13 +63,17 @@ class GlobalCommandsMixin:
                 raise ServerLoginFailed("Invalid credentials")
             assertion = response["assertion"]
 
-        async with self.client.check_command("trn", username, 0, assertion):
+        async with self.client.check_command(
+            "trn", username, 0, assertion, key=("trn",)
+        ):
             await self.client.expect(UpdateUserMessage, userid=userid)
 
     async def private_message(self, receiver, content):
         receiver = into_id(receiver)
 
-        async with self.client.check_command("pm", receiver, content):
+        async with self.client.check_command(
+            "pm", receiver, content, key=("pm", receiver)
+        ):
             message = await self.client.expect(PrivateMessage, receiver=receiver)
 
             if message.content.startswith("/error"):
@@ -75,6 +85,7 @@ class GlobalCommandsMixin:
             format,
             "none" if minimum_elo is None else minimum_elo,
             username_prefix,
+            key=("roomlist",),
         ):
             response = await self.client.expect(
                 QueryResponseMessage, querytype="roomlist"
@@ -83,14 +94,60 @@ class GlobalCommandsMixin:
                 self.client.rooms[battle_id] for battle_id in response.result["rooms"]
             ]
 
+    async def discover_battles(
+        self,
+        format="",
+        minimum_elo=None,
+        username_prefix="",
+        *,
+        interval=2,
+        max_interval=30,
+        backoff=2,
+        max_seen=4096,
+        seen_ttl=600,
+    ):
+        seen = OrderedDict()
+        previous = set()
+        delay = interval
+
+        while True:
+            battles = await self.query_battles(format, minimum_elo, username_prefix)
+            current = {battle.id for battle in battles}
+
+            now = time.monotonic()
+            while seen and next(iter(seen.values())) < now:
+                seen.popitem(last=False)
+
+            fresh = [
+                battle
+                for battle in battles
+                if battle.id not in previous
+                and battle.id not in seen
+                and not battle.joined
+            ]
+            previous = current
+
+            for battle in fresh:
+                seen[battle.id] = now + seen_ttl
+                if len(seen) > max_seen:
+                    seen.popitem(last=False)
+
+            delay = interval if fresh else min(delay * backoff, max_interval)
+
+            for battle in fresh:
+                yield battle
+
+            await asyncio.sleep(delay)
+
     async def join(self, room_id=None):
         room, room_id = _check_room_param(self, room_id)
 
         if room.joined:
             raise JoiningRoomFailed(f"Already joined {room_id}")
 
-        async with self.client.check_command("join", room_id):
-            if not await room.state.joined:
+        async with self.client.check_command("join", room_id, key=("room", room_id)):
+            message = await room.expect(InitMessage, NoInitMessage)
+            if isinstance(message, NoInitMessage):
                 room.handle_leave()
                 raise JoiningRoomFailed(f"Couldn't join room {room_id}")
             room.handle_join()
@@ -102,6 +159,6 @@ class GlobalCommandsMixin:
         if not room.joined:
             raise LeavingRoomFailed(f"Already left {room_id}")
 
-        async with self.client.check_command("leave", room_id):
+        async with self.client.check_command("leave", room_id, key=("room", room_id)):
             await room.expect(DeinitMessage)
             room.handle_leave()
@@ -1,6 +1,7 @@
 __all__ = [
     "PslibError",
     "ServerConnectionFailed",
+    "ServerConnectionClosed",
     "InvalidPayloadFormat",
     "InvalidMessageParameters",
     "ServerIdNotSpecified",
@@ -23,6 +24,10 @@ class ServerConnectionFailed(PslibError):
     pass
 
 
+class ServerConnectionClosed(PslibError):
+    pass
+
+
 class InvalidPayloadFormat(PslibError):
     pass
 
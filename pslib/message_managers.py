@@ -1,63 +1,675 @@
-__all__ = ["InboundMessageManager", "OutboundMessageManager"]
+__all__ = [
+    "Listener",
+    "Handler",
+    "InboundMessageManager",
+    "Command",
+    "OutboundMessageManager",
+]
 
 
+from collections import defaultdict, deque
 from contextlib import asynccontextmanager
-from weakref import WeakKeyDictionary
+from contextvars import ContextVar
+from itertools import count
+from operator import attrgetter
+from weakref import WeakSet, finalize, ref
 import asyncio
 
-from .errors import ServerResponseTimeout
-from .utils import race_against
+from .errors import (
+    ServerResponseTimeout,
+    ReceivedErrorMessage,
+    InvalidMessageParameters,
+)
+from .messages import ErrorMessage, RawMessage
+from .utils import TokenBucket, DeadlineScheduler
+
+
+THROTTLE_NOTICE = "message-throttle-notice"
+
+MISSING = object()
+
+UNHASHABLE = object()
+
+CURRENT_COMMAND = ContextVar("current_command", default=None)
+
+OVERFLOW_POLICIES = ["block", "drop_oldest", "drop_newest", "coalesce"]
+
+
+def _reduce_message_types(message_types):
+    return {
+        message_type
+        for message_type in message_types
+        if not any(
+            message_type is not other and issubclass(message_type, other)
+            for other in message_types
+        )
+    }
+
+
+class Listener:
+    def __init__(self, manager, keys, *, maxsize=0, overflow="block", key=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow policy {overflow!r}")
+        if overflow == "coalesce" and key is None:
+            raise ValueError("Expected key function for coalescing")
+
+        self.manager = manager
+        self.keys = keys
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.key = key
+
+        self.buffer = {} if overflow == "coalesce" else deque()
+        self.threshold = 1
+        self.waiter = None
+        self.space = None
+        self.closed = False
+
+        self.dropped = 0
+        self.delayed = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.get()
+
+    def qsize(self):
+        return len(self.buffer)
+
+    def full(self):
+        return 0 < self.maxsize <= len(self.buffer)
+
+    def put(self, message):
+        if self.overflow == "coalesce":
+            key = self.key(message)
+
+            if key in self.buffer:
+                self.buffer[key] = message
+                self.drop()
+                return True
+
+            if self.full():
+                del self.buffer[next(iter(self.buffer))]
+                self.drop()
+
+            self.buffer[key] = message
+            self.wake()
+            return True
+
+        if self.full():
+            if self.overflow == "block":
+                self.delayed += 1
+                self.manager.delayed += 1
+                return False
+
+            self.drop()
+
+            if self.overflow == "drop_newest":
+                return True
+
+            self.buffer.popleft()
+
+        self.append(message)
+        return True
+
+    def append(self, message):
+        self.buffer.append(message)
+        self.wake()
+
+    def wake(self, timeout=False):
+        if (
+            self.waiter
+            and not self.waiter.done()
+            and (timeout or len(self.buffer) >= self.threshold or self.full())
+        ):
+            self.waiter.set_result(timeout)
+
+    def drop(self):
+        self.dropped += 1
+        self.manager.dropped += 1
+
+    async def wait_for(self, size, timeout=None):
+        loop = asyncio.get_running_loop()
+        handle = timeout and loop.call_later(timeout, self.wake, True)
+        self.threshold = size
+
+        try:
+            while len(self.buffer) < size and not self.full():
+                self.waiter = loop.create_future()
+                if await self.waiter:
+                    break
+        finally:
+            self.threshold = 1
+            if handle:
+                handle.cancel()
+
+    def pop(self):
+        if self.overflow == "coalesce":
+            return self.buffer.pop(next(iter(self.buffer)))
+        return self.buffer.popleft()
+
+    async def get(self):
+        if not self.buffer:
+            await self.wait_for(1)
+
+        message = self.pop()
+        self.notify_space()
+
+        return message
+
+    async def get_batch(self, max_size=None, max_delay=0):
+        if not self.buffer:
+            await self.wait_for(1)
+
+        if max_delay:
+            await self.wait_for(max_size or float("inf"), max_delay)
+
+        size = len(self.buffer) if max_size is None else min(max_size, len(self.buffer))
+        batch = [self.pop() for _ in range(size)]
+        self.notify_space()
+
+        return batch
+
+    async def batches(self, max_size=None, max_delay=0):
+        while True:
+            yield await self.get_batch(max_size, max_delay)
+
+    def notify_space(self):
+        if self.space and not self.space.done():
+            self.space.set_result(None)
+
+    def space_available(self):
+        if self.space is None or self.space.done():
+            self.space = asyncio.get_running_loop().create_future()
+        return self.space
+
+    async def wait_for_space(self):
+        while self.full():
+            await self.space_available()
+
+    def close(self):
+        self.closed = True
+        self.manager.unregister(self.keys, self)
+        self.maxsize = 0
+        self.notify_space()
+
+    async def aclose(self):
+        self.close()
+
+    def __del__(self):
+        if getattr(self, "space", None):
+            self.notify_space()
+
+
+class Handler:
+    def __init__(self, manager, keys, callback, *, workers=1):
+        self.manager = manager
+        self.keys = keys
+        self.callback = callback
+        self.workers = workers
+        self.order = next(manager.handler_ids)
+
+        self.coroutine = asyncio.iscoroutinefunction(callback)
+        self.pending = deque()
+        self.tasks = set()
+
+        self.errors = 0
+
+    def __call__(self, message):
+        if not self.coroutine:
+            try:
+                self.callback(message)
+            except Exception as exc:
+                self.report(exc, message)
+
+        else:
+            self.pending.append(message)
+
+            if len(self.tasks) < self.workers:
+                self.tasks.add(asyncio.create_task(self.work()))
+
+    async def work(self):
+        try:
+            while self.pending:
+                message = self.pending.popleft()
+
+                try:
+                    await self.callback(message)
+                except Exception as exc:
+                    self.report(exc, message)
+        finally:
+            self.tasks.discard(asyncio.current_task())
+
+    def report(self, exc, message):
+        self.errors += 1
+
+        asyncio.get_running_loop().call_exception_handler(
+            {
+                "message": f"Unhandled exception in message handler {self.callback!r}",
+                "exception": exc,
+                "handler": self,
+                "received_message": message,
+            }
+        )
+
+    def remove(self):
+        self.manager.remove_handler(self)
+
+        for task in self.tasks:
+            task.cancel()
 
 
 class InboundMessageManager:
     def __init__(self):
-        self.listeners = WeakKeyDictionary()
+        self.listeners = defaultdict(WeakSet)
+        self.handlers = defaultdict(dict)
+        self.handler_ids = count()
+        self.waiters = defaultdict(dict)
+        self.routes = {}
+        self.blocked = deque()
+
+        self.dropped = 0
+        self.delayed = 0
+
+    def resolve(self, message_class):
+        if (route := self.routes.get(message_class)) is None:
+            registered = {
+                message_type
+                for message_type, _ in (*self.listeners, *self.handlers, *self.waiters)
+            }
+            route = self.routes[message_class] = tuple(
+                message_type
+                for message_type in (None, *message_class.__mro__)
+                if message_type in registered
+            )
+        return route
 
     def dispatch(self, message):
-        for queue, message_types in self.listeners.items():
-            if not message_types or isinstance(message, message_types):
-                queue.put_nowait(message)
+        room_id = message.room.id
+        route = self.resolve(type(message))
+
+        if self.handlers:
+            matched = [
+                handler
+                for message_type in route
+                for key in ((message_type, None), (message_type, room_id))
+                for handler in self.handlers.get(key, ())
+            ]
+
+            if len(matched) > 1:
+                matched.sort(key=attrgetter("order"))
+
+            for handler in matched:
+                handler(message)
+
+        if self.waiters:
+            for message_type in route:
+                for key in ((message_type, None), (message_type, room_id)):
+                    if waiters := self.waiters.get(key):
+                        self.resolve_waiters(message, waiters)
 
-    async def listen(self, *message_types):
-        queue = asyncio.Queue()
-        self.listeners[queue] = message_types
+        for message_type in route:
+            for key in ((message_type, None), (message_type, room_id)):
+                if listeners := self.listeners.get(key):
+                    for listener in listeners:
+                        if not listener.put(message):
+                            self.blocked.append((ref(listener), message))
 
-        while message := await queue.get():
-            yield message
+    def resolve_waiters(self, message, waiters):
+        for names, table in waiters.items():
+            try:
+                values = tuple(getattr(message, name, MISSING) for name in names)
+            except InvalidMessageParameters:
+                continue
+
+            try:
+                futures = table.get(values)
+            except TypeError:
+                futures = None
+
+            if futures:
+                self.resolve_futures(message, futures.items())
+
+            if unhashable := table.get(UNHASHABLE):
+                self.resolve_futures(
+                    message,
+                    [
+                        (future, command)
+                        for future, (expected, command) in unhashable.items()
+                        if expected == values
+                    ],
+                )
+
+    def resolve_futures(self, message, futures):
+        for future, command in futures:
+            if not future.done():
+                future.set_result(message)
+                if command:
+                    command.answer()
+
+    async def expect(self, *message_types, room_id=None, **attrs):
+        future = asyncio.get_running_loop().create_future()
+
+        names = tuple(sorted(attrs))
+        values = tuple(attrs[name] for name in names)
+        keys = [
+            (message_type, room_id)
+            for message_type in _reduce_message_types(message_types) or [None]
+        ]
+
+        command = CURRENT_COMMAND.get()
+
+        try:
+            hash(values)
+        except TypeError:
+            slot, entry = UNHASHABLE, (values, command)
+        else:
+            slot, entry = values, command
+
+        for key in keys:
+            if key not in self.waiters:
+                self.routes.clear()
+            self.waiters[key].setdefault(names, {}).setdefault(slot, {})[future] = entry
+
+        try:
+            return await future
+        finally:
+            for key in keys:
+                waiters = self.waiters[key]
+                table = waiters[names]
+                futures = table[slot]
+                del futures[future]
+
+                if not futures:
+                    del table[slot]
+                    if not table:
+                        del waiters[names]
+                        if not waiters:
+                            del self.waiters[key]
+                            self.routes.clear()
+
+    async def drain(self):
+        while self.blocked:
+            if space := self.unblock():
+                await space
+
+    def unblock(self):
+        listener, message = self.blocked[0]
+
+        if (listener := listener()) is not None and not listener.closed:
+            if listener.full():
+                return listener.space_available()
+            listener.append(message)
+
+        self.blocked.popleft()
+        return None
+
+    def register(self, keys, listener):
+        for key in keys:
+            if key not in self.listeners:
+                self.routes.clear()
+            self.listeners[key].add(listener)
+
+        finalize(listener, self.prune, keys)
+
+    def add_handler(self, callback, *message_types, room_id=None, **options):
+        keys = [
+            (message_type, room_id)
+            for message_type in _reduce_message_types(message_types) or [None]
+        ]
+
+        handler = Handler(self, keys, callback, **options)
+
+        for key in keys:
+            if key not in self.handlers:
+                self.routes.clear()
+            self.handlers[key][handler] = None
+
+        return handler
+
+    def remove_handler(self, handler):
+        for key in handler.keys:
+            if (handlers := self.handlers.get(key)) is not None:
+                handlers.pop(handler, None)
+                if not handlers:
+                    del self.handlers[key]
+                    self.routes.clear()
+
+    def unregister(self, keys, listener):
+        for key in keys:
+            if (listeners := self.listeners.get(key)) is not None:
+                listeners.discard(listener)
+                if not listeners:
+                    del self.listeners[key]
+                    self.routes.clear()
+
+    def prune(self, keys):
+        for key in keys:
+            if (listeners := self.listeners.get(key)) is not None:
+                if next(iter(listeners), None) is None:
+                    del self.listeners[key]
+                    self.routes.clear()
+
+    def listen(self, *message_types, room_id=None, **options):
+        keys = [
+            (message_type, room_id)
+            for message_type in _reduce_message_types(message_types) or [None]
+        ]
+
+        listener = Listener(self, keys, **options)
+        self.register(keys, listener)
+
+        return listener
+
+
+class Command:
+    def __init__(self, manager, raw_message, room_id, error_filter=None):
+        self.manager = manager
+        self.raw_message = raw_message
+        self.room_id = room_id
+        self.error_filter = error_filter
+        self.task = asyncio.current_task()
+        self.waiting = asyncio.get_running_loop().create_future()
+        self.deadline = None
+        self.active = False
+        self.error = None
+
+    def fail(self, error):
+        if self.active and self.error is None:
+            self.error = error
+            self.task.cancel()
+
+    def timeout(self):
+        self.fail(ServerResponseTimeout("Server took too long to respond"))
+
+    def answer(self):
+        if self.active:
+            self.manager.retire(self)
 
 
 class OutboundMessageManager:
-    def __init__(self, *, messages_per_second=20, response_timeout=5):
+    needs = (ErrorMessage, RawMessage)
+
+    def __init__(
+        self,
+        *,
+        messages_per_second=20,
+        burst=6,
+        response_timeout=5,
+        pipelined=False,
+        batch_size=1,
+        batch_window=0,
+    ):
         self.queue = asyncio.Queue()
-        self.delay = 1 / messages_per_second
+        self.limiter = TokenBucket(messages_per_second, burst)
+        self.deadlines = DeadlineScheduler()
+        self.batch_size = batch_size
+        self.batch_window = batch_window
         self.response_timeout = response_timeout
+        self.pipelined = pipelined
+        self.pending = {}
+        self.in_flight = defaultdict(deque)
+        self.exclusive = {}
+        self.deferred = defaultdict(deque)
 
     async def collect(self):
-        while entry := await self.queue.get():
-            raw_message, waiting = entry
+        async for batch in self.collect_batches():
+            for raw_message in batch:
+                yield raw_message
 
-            done = asyncio.Future()
-            waiting.set_result(done)
+    async def collect_batches(self):
+        while command := await self.queue.get():
+            if command.waiting.done() or self.defer(command):
+                continue
 
-            await asyncio.sleep(self.delay)
+            await self.limiter.acquire()
 
-            try:
-                yield raw_message
-            finally:
-                await done
+            batch = [raw_message] if (raw_message := self.start(command)) else []
+
+            if self.batch_size > 1:
+                if self.batch_window:
+                    await asyncio.sleep(self.batch_window)
+
+                while (
+                    len(batch) < self.batch_size
+                    and not self.queue.empty()
+                    and not self.limiter.reserve()
+                ):
+                    command = self.queue.get_nowait()
+                    if command.waiting.done() or self.defer(command):
+                        continue
+                    if raw_message := self.start(command):
+                        batch.append(raw_message)
+
+            if batch:
+                yield batch
+
+    def start(self, command):
+        if command.waiting.done():
+            return None
+
+        self.in_flight[command.room_id].append(command)
+
+        command.active = True
+        command.deadline = self.deadlines.schedule(
+            self.response_timeout, command.timeout
+        )
+        command.waiting.set_result(None)
+
+        return command.raw_message
+
+    def defer(self, command):
+        if command.error_filter is not None:
+            return False
+
+        current = self.exclusive.setdefault(command.room_id, command)
+
+        if current is not command:
+            self.deferred[command.room_id].append(command)
+            return True
+
+        return False
+
+    def resume(self, room_id):
+        deferred = self.deferred.get(room_id, ())
 
-    async def _raise_timeout_error(self):
-        await asyncio.sleep(self.response_timeout)
-        raise ServerResponseTimeout("Server took too long to respond")
+        while deferred:
+            command = deferred.popleft()
+            if not command.waiting.done():
+                self.exclusive[room_id] = command
+                self.queue.put_nowait(command)
+                break
+
+        if not deferred:
+            self.deferred.pop(room_id, None)
+
+    @property
+    def budget(self):
+        return self.limiter.budget
+
+    def handle_message(self, message):
+        if isinstance(message, ErrorMessage):
+            unfiltered = None
+
+            for command in self.in_flight.get(message.room.id, ()):
+                if not command.active or command.error is not None:
+                    continue
+                if command.error_filter is None:
+                    unfiltered = unfiltered or command
+                elif command.error_filter(message):
+                    break
+            else:
+                command = unfiltered
+
+            if command:
+                command.fail(ReceivedErrorMessage(message.error))
+
+        elif isinstance(message, RawMessage) and THROTTLE_NOTICE in message.value:
+            self.limiter.throttle()
+
+    def retire(self, command):
+        command.active = False
+
+        if command.deadline:
+            self.deadlines.cancel(command.deadline)
+            command.deadline = None
+
+        self.discard(command)
+
+        if self.exclusive.get(command.room_id) is command:
+            del self.exclusive[command.room_id]
+            self.resume(command.room_id)
+
+    def discard(self, command):
+        if command in (in_flight := self.in_flight.get(command.room_id, ())):
+            in_flight.remove(command)
+            if not in_flight:
+                del self.in_flight[command.room_id]
+
+    def acquire(self, key, command):
+        if key in self.pending:
+            self.pending[key].append(command)
+        else:
+            self.pending[key] = deque()
+            self.queue.put_nowait(command)
+
+    def release(self, key, command):
+        pending = self.pending[key]
+
+        if command in pending:
+            pending.remove(command)
+        elif pending:
+            self.queue.put_nowait(pending.popleft())
+        else:
+            del self.pending[key]
 
     @asynccontextmanager
-    async def append(self, raw_message):
-        waiting = asyncio.Future()
-        self.queue.put_nowait((raw_message, waiting))
-        done = await waiting
+    async def append(self, raw_message, *, key=None, error_filter=None):
+        room_id = raw_message.partition("|")[0]
+
+        if not self.pipelined:
+            key = None
+        elif key is None:
+            key = room_id
+
+        command = Command(self, raw_message, room_id, error_filter)
+        self.acquire(key, command)
+        token = None
 
         try:
-            async with race_against(self._raise_timeout_error()):
-                yield
+            await command.waiting
+            token = CURRENT_COMMAND.set(command)
+            yield command
+        except asyncio.CancelledError:
+            if command.error is None:
+                raise
+            if uncancel := getattr(command.task, "uncancel", None):
+                uncancel()
+            raise command.error from None
         finally:
-            done.set_result(None)
+            if token is not None:
+                CURRENT_COMMAND.reset(token)
+
+            self.retire(command)
+            self.release(key, command)
@@ -1,5 +1,6 @@
 __all__ = [
     "parse_message",
+    "split_message",
     "Message",
     "UnrecognizedMessage",
     "PlainTextMessage",
@@ -22,43 +23,228 @@ __all__ = [
     "BattleMessage",
     "WinMessage",
     "RawMessage",
+    "BattleProtocolMessage",
+    "PlayerMessage",
+    "TeamSizeMessage",
+    "GameTypeMessage",
+    "GenerationMessage",
+    "TierMessage",
+    "PokeMessage",
+    "StartMessage",
+    "TurnMessage",
+    "UpkeepMessage",
+    "TieMessage",
+    "RequestMessage",
+    "MoveMessage",
+    "SwitchMessage",
+    "DetailsChangeMessage",
+    "CantMessage",
+    "FaintMessage",
+    "DamageMessage",
+    "HealMessage",
+    "SetHpMessage",
+    "StatusMessage",
+    "CureStatusMessage",
+    "BoostMessage",
+    "UnboostMessage",
+    "WeatherMessage",
+    "FieldStartMessage",
+    "FieldEndMessage",
+    "SideStartMessage",
+    "SideEndMessage",
+    "EffectStartMessage",
+    "EffectEndMessage",
+    "CritMessage",
+    "SuperEffectiveMessage",
+    "ResistedMessage",
+    "ImmuneMessage",
+    "MissMessage",
+    "ItemMessage",
+    "EndItemMessage",
+    "AbilityMessage",
+    "ActivateMessage",
+    "FailMessage",
 ]
 
 
 import json
-from dataclasses import dataclass
 
 from .errors import InvalidMessageParameters
 from .utils import compose, into_id
 
 
 MESSAGE_CLASS_REGISTRY = {}
+BATTLE_MESSAGE_REGISTRY = {}
 
 
-def parse_message(raw_message):
-    message_type = ""
-    if raw_message.startswith("|"):
-        message_type, _, raw_message = raw_message[1:].partition("|")
+def parse_message(
+    raw_message, room=None, *, lazy=False, registry=None, start=0, end=None
+):
+    message_type, offset = split_message(raw_message, start, end)
+
+    if registry is None:
+        registry = MESSAGE_CLASS_REGISTRY
+
+    cls = registry.get(message_type, UnrecognizedMessage)
+    return cls(message_type, raw_message[offset:end], room, lazy)
+
+
+def split_message(raw_message, start=0, end=None):
+    if not raw_message.startswith("|", start, end):
+        return "", start
+
+    separator = raw_message.find("|", start + 1, end)
+
+    if separator < 0:
+        return raw_message[start + 1 : end], len(raw_message) if end is None else end
+
+    return raw_message[start + 1 : separator], separator + 1
+
+
+def compile_fields(name, fields, keywords=False):
+    namespace = {"InvalidMessageParameters": InvalidMessageParameters}
+    lines = [f"def {name}(self):"]
+    required = sum(len(field) == 2 for field in fields)
+
+    if keywords:
+        lines += [
+            "    params = self.value.split('|')",
+            "    keywords = {}",
+            f"    while len(params) > {required} and params[-1][:1] == '[':",
+            "        key, _, value = params.pop()[1:].partition('] ')",
+            "        keywords[key.rstrip(']')] = value",
+            "    self.keywords = keywords",
+        ]
+        if fields:
+            last = len(fields) - 1
+            lines += [
+                f"    if len(params) > {len(fields)}:",
+                f"        params[{last}:] = ['|'.join(params[{last}:])]",
+            ]
+    elif len(fields) > 1 or required < len(fields):
+        lines.append(f"    params = self.value.split('|', {len(fields) - 1})")
+
+    if keywords or required < len(fields):
+        lines += [
+            "    count = len(params)",
+            f"    if count < {required}:",
+            f"        raise InvalidMessageParameters('Expected {required} parameters')",
+        ]
+    elif len(fields) > 1:
+        lines += [
+            f"    if len(params) != {len(fields)}:",
+            f"        raise InvalidMessageParameters('Expected {len(fields)} parameters')",
+        ]
+
+    split = len(lines) > 1
+
+    for i, (field_name, converter, *default) in enumerate(fields):
+        param = f"params[{i}]" if split else "self.value"
+
+        if converter is not str:
+            namespace[f"convert_{i}"] = converter
+            param = f"convert_{i}({param})"
+
+        if default:
+            namespace[f"default_{i}"] = default[0]
+            param = f"{param} if count > {i} else default_{i}"
+
+        lines.append(f"    self.{field_name} = {param}")
+
+    exec("\n".join(lines), namespace)
+    return namespace[name]
+
+
+def into_request(value):
+    return json.loads(value) if value else None
+
+
+def into_userlist(value):
+    _, *userlist = value.split(",")
+    return list(map(into_id, userlist))
+
+
+class MessageMeta(type):
+    def __new__(cls, name, bases, namespace, **kwargs):
+        inherited = {
+            slot
+            for base in bases
+            for klass in base.__mro__
+            for slot in klass.__dict__.get("__slots__", ())
+        }
+        namespace["__slots__"] = (
+            *namespace.get("__slots__", ()),
+            *(
+                field_name
+                for field_name, *_ in namespace.get("fields", ())
+                if field_name not in inherited
+            ),
+        )
+        return super().__new__(cls, name, bases, namespace, **kwargs)
+
+
+class Message(metaclass=MessageMeta):
+    __slots__ = ("type", "value", "room", "hydrated")
+
+    fields = ()
+    keyword_suffixes = False
 
-    cls = MESSAGE_CLASS_REGISTRY.get(message_type, UnrecognizedMessage)
-    return cls(message_type, raw_message)
+    def __init__(self, type, value, room=None, lazy=False):
+        self.type = type
+        self.value = value
+        self.room = room
+        self.hydrated = not lazy
 
+        if not lazy:
+            self.hydrate()
 
-@dataclass
-class Message:
-    type: str
-    value: str
+    def __repr__(self):
+        return f"{type(self).__name__}(type={self.type!r}, value={self.value!r})"
 
-    def __init_subclass__(cls, match=()):
+    def __eq__(self, other):
+        if other.__class__ is self.__class__:
+            return (self.type, self.value) == (other.type, other.value)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __init_subclass__(cls, match=(), battle=False):
         for message_type in match:
-            MESSAGE_CLASS_REGISTRY[message_type] = cls
+            if not battle:
+                MESSAGE_CLASS_REGISTRY[message_type] = cls
+            BATTLE_MESSAGE_REGISTRY[message_type] = cls
+
+        if "fields" in cls.__dict__:
+            cls.unpack_fields = compile_fields(
+                "unpack_fields", cls.fields, keywords=cls.keyword_suffixes
+            )
+            cls.unpack_fields.__qualname__ = f"{cls.__qualname__}.unpack_fields"
+
+            if "hydrate" not in cls.__dict__:
+                cls.hydrate = cls.unpack_fields
 
-    def __post_init__(self):
-        self.hydrate()
+    def __getattr__(self, name):
+        if name.startswith("__") or name == "hydrated" or self.hydrated:
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
+            )
+
+        self.hydrated = True
+
+        try:
+            self.hydrate()
+        except:
+            self.hydrated = False
+            raise
+
+        return getattr(self, name)
 
     def hydrate(self):
         pass
 
+    def unpack_fields(self):
+        pass
+
     def unpack(self, *transformers):
         params = self.value.split("|", len(transformers) - 1)
 
@@ -82,50 +268,44 @@ class PlainTextMessage(Message, match=[""]):
 
 
 class ErrorMessage(Message, match=["error"]):
-    def hydrate(self):
-        self.error = self.unpack(str)
+    fields = [("error", str)]
 
 
 class UpdateUserMessage(Message, match=["updateuser"]):
-    def hydrate(self):
-        self.userid, self.named, self.avatar, self.settings = self.unpack(
-            into_id, compose(bool, int), int, json.loads
-        )
+    fields = [
+        ("userid", into_id),
+        ("named", compose(bool, int)),
+        ("avatar", int),
+        ("settings", json.loads),
+    ]
 
 
 class ChallstrMessage(Message, match=["challstr"]):
-    def hydrate(self):
-        self.challstr = self.unpack(str)
+    fields = [("challstr", str)]
 
 
 class PrivateMessage(Message, match=["pm"]):
-    def hydrate(self):
-        self.sender, self.receiver, self.content = self.unpack(into_id, into_id, str)
+    fields = [("sender", into_id), ("receiver", into_id), ("content", str)]
 
 
 class QueryResponseMessage(Message, match=["queryresponse"]):
-    def hydrate(self):
-        self.querytype, self.result = self.unpack(str, json.loads)
+    fields = [("querytype", str), ("result", json.loads)]
 
 
 class InitMessage(Message, match=["init"]):
-    def hydrate(self):
-        self.roomtype = self.unpack(str)
+    fields = [("roomtype", str)]
 
 
 class NoInitMessage(Message, match=["noinit"]):
-    def hydrate(self):
-        self.error, self.details = self.unpack(str, str)
+    fields = [("error", str), ("details", str)]
 
 
 class TitleMessage(Message, match=["title"]):
-    def hydrate(self):
-        self.title = self.unpack(str)
+    fields = [("title", str)]
 
 
 class UsersMessage(Message, match=["users"]):
-    def hydrate(self):
-        self.userlist = list(map(into_id, self.unpack(str).split(",")))
+    fields = [("userlist", into_userlist)]
 
 
 class DeinitMessage(Message, match=["deinit"]):
@@ -133,45 +313,221 @@ class DeinitMessage(Message, match=["deinit"]):
 
 
 class ChatMessage(Message, match=["chat", "c"]):
-    def hydrate(self):
-        self.sender, self.content = self.unpack(into_id, str)
+    fields = [("sender", into_id), ("content", str)]
 
 
 class TimestampChatMessage(ChatMessage, match=["c:"]):
-    def hydrate(self):
-        self.timestamp, self.sender, self.content = self.unpack(int, into_id, str)
+    fields = [("timestamp", int), ("sender", into_id), ("content", str)]
 
 
 class TimestampMessage(Message, match=[":"]):
-    def hydrate(self):
-        self.timestamp = self.unpack(int)
+    fields = [("timestamp", int)]
 
 
 class JoinMessage(Message, match=["join", "j", "J"]):
-    def hydrate(self):
-        self.joined = self.unpack(into_id)
+    fields = [("joined", into_id)]
 
 
 class LeaveMessage(Message, match=["leave", "l", "L"]):
-    def hydrate(self):
-        self.left = self.unpack(into_id)
+    fields = [("left", into_id)]
 
 
 class NameMessage(Message, match=["name", "n", "N"]):
-    def hydrate(self):
-        self.new_userid, self.old_userid = self.unpack(into_id, into_id)
+    fields = [("new_userid", into_id), ("old_userid", into_id)]
 
 
 class BattleMessage(Message, match=["battle", "b", "B"]):
+    __slots__ = ("battle",)
+
+    fields = [("battle_id", str), ("p1", into_id), ("p2", into_id)]
+
     def hydrate(self):
-        battle_id, self.p1, self.p2 = self.unpack(str, into_id, into_id)
-        self.battle = self.room.client.rooms[battle_id]
+        self.unpack_fields()
+        self.battle = self.room and self.room.client.rooms[self.battle_id]
 
 
 class WinMessage(Message, match=["win"]):
-    def hydrate(self):
-        self.userid = self.unpack(into_id)
+    fields = [("userid", into_id)]
 
 
 class RawMessage(Message, match=["raw"]):
     pass
+
+
+class BattleProtocolMessage(Message):
+    __slots__ = ("keywords",)
+
+    keyword_suffixes = True
+
+    fields = []
+
+
+class PlayerMessage(BattleProtocolMessage, match=["player"], battle=True):
+    fields = [
+        ("player", str),
+        ("username", str, ""),
+        ("avatar", str, ""),
+        ("rating", str, ""),
+    ]
+
+
+class TeamSizeMessage(BattleProtocolMessage, match=["teamsize"], battle=True):
+    fields = [("player", str), ("size", int)]
+
+
+class GameTypeMessage(BattleProtocolMessage, match=["gametype"], battle=True):
+    fields = [("gametype", str)]
+
+
+class GenerationMessage(BattleProtocolMessage, match=["gen"], battle=True):
+    fields = [("generation", int)]
+
+
+class TierMessage(BattleProtocolMessage, match=["tier"], battle=True):
+    fields = [("tier", str)]
+
+
+class PokeMessage(BattleProtocolMessage, match=["poke"], battle=True):
+    fields = [("player", str), ("details", str), ("item", str, "")]
+
+
+class StartMessage(BattleProtocolMessage, match=["start"], battle=True):
+    pass
+
+
+class TurnMessage(BattleProtocolMessage, match=["turn"], battle=True):
+    fields = [("turn", int)]
+
+
+class UpkeepMessage(BattleProtocolMessage, match=["upkeep"], battle=True):
+    pass
+
+
+class TieMessage(BattleProtocolMessage, match=["tie"], battle=True):
+    pass
+
+
+class RequestMessage(Message, match=["request"], battle=True):
+    fields = [("request", into_request)]
+
+
+class MoveMessage(BattleProtocolMessage, match=["move"], battle=True):
+    fields = [("pokemon", str), ("move", str), ("target", str, "")]
+
+
+class SwitchMessage(
+    BattleProtocolMessage, match=["switch", "drag", "replace"], battle=True
+):
+    fields = [("pokemon", str), ("details", str), ("condition", str, "")]
+
+
+class DetailsChangeMessage(
+    BattleProtocolMessage, match=["detailschange", "-formechange"], battle=True
+):
+    fields = [("pokemon", str), ("details", str), ("condition", str, "")]
+
+
+class CantMessage(BattleProtocolMessage, match=["cant"], battle=True):
+    fields = [("pokemon", str), ("reason", str), ("move", str, "")]
+
+
+class FaintMessage(BattleProtocolMessage, match=["faint"], battle=True):
+    fields = [("pokemon", str)]
+
+
+class DamageMessage(BattleProtocolMessage, match=["-damage"], battle=True):
+    fields = [("pokemon", str), ("condition", str)]
+
+
+class HealMessage(BattleProtocolMessage, match=["-heal"], battle=True):
+    fields = DamageMessage.fields
+
+
+class SetHpMessage(BattleProtocolMessage, match=["-sethp"], battle=True):
+    fields = DamageMessage.fields
+
+
+class StatusMessage(BattleProtocolMessage, match=["-status"], battle=True):
+    fields = [("pokemon", str), ("status", str)]
+
+
+class CureStatusMessage(BattleProtocolMessage, match=["-curestatus"], battle=True):
+    fields = StatusMessage.fields
+
+
+class BoostMessage(BattleProtocolMessage, match=["-boost"], battle=True):
+    fields = [("pokemon", str), ("stat", str), ("amount", int)]
+
+
+class UnboostMessage(BattleProtocolMessage, match=["-unboost"], battle=True):
+    fields = BoostMessage.fields
+
+
+class WeatherMessage(BattleProtocolMessage, match=["-weather"], battle=True):
+    fields = [("weather", str)]
+
+
+class FieldStartMessage(BattleProtocolMessage, match=["-fieldstart"], battle=True):
+    fields = [("condition", str)]
+
+
+class FieldEndMessage(BattleProtocolMessage, match=["-fieldend"], battle=True):
+    fields = FieldStartMessage.fields
+
+
+class SideStartMessage(BattleProtocolMessage, match=["-sidestart"], battle=True):
+    fields = [("side", str), ("condition", str)]
+
+
+class SideEndMessage(BattleProtocolMessage, match=["-sideend"], battle=True):
+    fields = SideStartMessage.fields
+
+
+class EffectStartMessage(BattleProtocolMessage, match=["-start"], battle=True):
+    fields = [("pokemon", str), ("effect", str)]
+
+
+class EffectEndMessage(BattleProtocolMessage, match=["-end"], battle=True):
+    fields = EffectStartMessage.fields
+
+
+class CritMessage(BattleProtocolMessage, match=["-crit"], battle=True):
+    fields = [("pokemon", str)]
+
+
+class SuperEffectiveMessage(
+    BattleProtocolMessage, match=["-supereffective"], battle=True
+):
+    fields = CritMessage.fields
+
+
+class ResistedMessage(BattleProtocolMessage, match=["-resisted"], battle=True):
+    fields = CritMessage.fields
+
+
+class ImmuneMessage(BattleProtocolMessage, match=["-immune"], battle=True):
+    fields = CritMessage.fields
+
+
+class MissMessage(BattleProtocolMessage, match=["-miss"], battle=True):
+    fields = [("pokemon", str), ("target", str, "")]
+
+
+class ItemMessage(BattleProtocolMessage, match=["-item"], battle=True):
+    fields = [("pokemon", str), ("item", str)]
+
+
+class EndItemMessage(BattleProtocolMessage, match=["-enditem"], battle=True):
+    fields = ItemMessage.fields
+
+
+class AbilityMessage(BattleProtocolMessage, match=["-ability"], battle=True):
+    fields = [("pokemon", str), ("ability", str)]
+
+
+class ActivateMessage(BattleProtocolMessage, match=["-activate"], battle=True):
+    fields = [("pokemon", str), ("effect", str, "")]
+
+
+class FailMessage(BattleProtocolMessage, match=["-fail"], battle=True):
+    fields = [("pokemon", str), ("action", str, "")]
@@ -11,6 +11,7 @@ import websockets
 
 from .errors import (
     ServerConnectionFailed,
+    ServerConnectionClosed,
     InvalidPayloadFormat,
     ServerIdNotSpecified,
     InvalidServerActionResponse,
@@ -91,28 +92,79 @@ class WebsocketContext:
             yield cls(ws, sticky=sticky)
 
     def decode_payload(self, payload):
-        if self.sticky:
-            if not payload.startswith("a"):
-                raise InvalidPayloadFormat("Expected prefix 'a'")
-            try:
-                payload = json.loads(payload[1:])[0]
-            except (json.JSONDecodeError, IndexError) as exc:
-                raise InvalidPayloadFormat("Expected valid json") from exc
+        if not self.sticky:
+            yield from self.decode_frame(payload)
+            return
+
+        prefix = payload[:1]
+
+        if prefix == "a":
+            for frame in self.load_frame_data(payload, list):
+                yield from self.decode_frame(frame)
+
+        elif prefix == "c":
+            code, reason = self.load_frame_data(payload, list)
+            raise ServerConnectionClosed(
+                f"Server closed the connection: {reason} ({code})"
+            )
+
+        elif prefix not in ("h", "o"):
+            raise InvalidPayloadFormat("Expected SockJS frame")
+
+    def load_frame_data(self, payload, expected_type):
+        try:
+            data = json.loads(payload[1:])
+        except json.JSONDecodeError as exc:
+            raise InvalidPayloadFormat("Expected valid json") from exc
+
+        if not isinstance(data, expected_type):
+            raise InvalidPayloadFormat(f"Expected json {expected_type.__name__}")
+
+        return data
 
+    def decode_frame(self, frame):
         room_id = "lobby"
+        start = 0
+        end = len(frame)
 
-        if payload.startswith(">"):
-            room_id, _, payload = payload[1:].partition("\n")
+        if frame.startswith(">"):
+            start = frame.find("\n")
+            if start < 0:
+                start = end
+            room_id = frame[1:start]
+            start += 1
 
-        for line in payload.splitlines():
-            if raw_message := line.strip():
-                yield room_id, raw_message
+        while start < end:
+            stop = frame.find("\n", start)
+            if stop < 0:
+                stop = end
 
-    async def receive_raw_messages(self):
+            if start < stop and not (
+                frame[start].isspace() or frame[stop - 1].isspace()
+            ):
+                yield room_id, frame, start, stop
+
+            elif raw_message := frame[start:stop].strip():
+                offset = frame.find(raw_message, start)
+                yield room_id, frame, offset, offset + len(raw_message)
+
+            start = stop + 1
+
+    async def receive_raw_spans(self):
         async for payload in self.protocol:
-            for room_id, raw_message in self.decode_payload(payload):
-                yield room_id, raw_message
+            for span in self.decode_payload(payload):
+                yield span
+
+    async def receive_raw_messages(self):
+        async for room_id, frame, start, end in self.receive_raw_spans():
+            yield room_id, frame[start:end]
 
     async def send_raw_message(self, raw_message):
-        data = json.dumps([raw_message]) if self.sticky else raw_message
-        await self.protocol.send(data)
+        await self.send_raw_messages([raw_message])
+
+    async def send_raw_messages(self, raw_messages):
+        if self.sticky:
+            await self.protocol.send(json.dumps(raw_messages))
+        else:
+            for raw_message in raw_messages:
+                await self.protocol.send(raw_message)
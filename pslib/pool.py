@@ -0,0 +1,86 @@
+__all__ = ["connect_pool", "ClientPool"]
+
+
+from contextlib import asynccontextmanager, AsyncExitStack
+import asyncio
+
+from .client import Client
+from .commands import GlobalCommandsMixin
+from .utils import concurrent_tasks
+
+
+@asynccontextmanager
+async def connect_pool(size, server="showdown", *, credentials=(), **kwargs):
+    async with ClientPool.connect(
+        size, server, credentials=credentials, **kwargs
+    ) as pool:
+        yield pool
+
+
+class ClientPool:
+    def __init__(self, clients):
+        self.clients = list(clients)
+
+    @classmethod
+    @asynccontextmanager
+    async def connect(cls, size, server="showdown", *, credentials=(), **kwargs):
+        async with AsyncExitStack() as stack:
+            clients = [
+                await stack.enter_async_context(Client.connect(server, **kwargs))
+                for _ in range(size)
+            ]
+
+            await asyncio.gather(
+                *(
+                    client.login(*credential)
+                    for client, credential in zip(clients, credentials)
+                )
+            )
+
+            yield cls(clients)
+
+    def load(self, client):
+        return (
+            len(client.rooms)
+            + len(client.rooms.temporary_rooms)
+            + client.sent_messages.queue.qsize()
+        )
+
+    def owner(self, room_id):
+        for client in self.clients:
+            if room_id in client.rooms or room_id in client.rooms.temporary_rooms:
+                return client
+
+        return min(self.clients, key=self.load)
+
+    def room(self, room_id):
+        return self.owner(room_id).rooms[room_id]
+
+    async def join(self, room_id):
+        return await self.room(room_id).join()
+
+    async def leave(self, room_id):
+        await self.room(room_id).leave()
+
+    async def query_battles(self, format="", minimum_elo=None, username_prefix=""):
+        client = min(self.clients, key=self.load)
+        battle_ids = [
+            battle.id
+            for battle in await client.query_battles(
+                format, minimum_elo, username_prefix
+            )
+        ]
+        return [self.room(battle_id) for battle_id in battle_ids]
+
+    discover_battles = GlobalCommandsMixin.discover_battles
+
+    async def listen(self, *message_types, all_rooms=True):
+        queue = asyncio.Queue()
+
+        async def forward(client):
+            async for message in client.listen(*message_types, all_rooms=all_rooms):
+                queue.put_nowait(message)
+
+        async with concurrent_tasks(*map(forward, self.clients)):
+            while True:
+                yield await queue.get()
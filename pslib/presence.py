@@ -0,0 +1,59 @@
+__all__ = ["PresenceIndex"]
+
+
+from .messages import UsersMessage, JoinMessage, LeaveMessage, NameMessage
+
+
+EMPTY = frozenset()
+
+
+class PresenceIndex:
+    needs = (UsersMessage, JoinMessage, LeaveMessage, NameMessage)
+
+    def __init__(self):
+        self.room_users = {}
+        self.user_rooms = {}
+
+    def users(self, room_id):
+        return self.room_users.get(room_id, EMPTY)
+
+    def rooms(self, userid):
+        return self.user_rooms.get(userid, EMPTY)
+
+    def add(self, room_id, userid):
+        self.room_users.setdefault(room_id, set()).add(userid)
+        self.user_rooms.setdefault(userid, set()).add(room_id)
+
+    def discard(self, room_id, userid):
+        if (users := self.room_users.get(room_id)) is not None:
+            users.discard(userid)
+            if not users:
+                del self.room_users[room_id]
+
+        if (rooms := self.user_rooms.get(userid)) is not None:
+            rooms.discard(room_id)
+            if not rooms:
+                del self.user_rooms[userid]
+
+    def discard_room(self, room_id):
+        for userid in self.room_users.pop(room_id, ()):
+            rooms = self.user_rooms[userid]
+            rooms.discard(room_id)
+            if not rooms:
+                del self.user_rooms[userid]
+
+    def handle_message(self, message):
+        if isinstance(message, JoinMessage):
+            self.add(message.room.id, message.joined)
+
+        elif isinstance(message, LeaveMessage):
+            self.discard(message.room.id, message.left)
+
+        elif isinstance(message, NameMessage):
+            self.discard(message.room.id, message.old_userid)
+            self.add(message.room.id, message.new_userid)
+
+        elif isinstance(message, UsersMessage):
+            self.discard_room(message.room.id)
+            for userid in message.userlist:
+                self.add(message.room.id, userid)
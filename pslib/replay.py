@@ -0,0 +1,57 @@
+__all__ = ["replay", "capture_payloads", "ReplayContext"]
+
+
+from contextlib import asynccontextmanager
+import asyncio
+
+from .capture import CaptureReader
+from .client import Client
+from .network import WebsocketContext
+from .utils import AsyncAttribute
+
+
+@asynccontextmanager
+async def replay(payloads, *, speed=None, sticky=True, **kwargs):
+    async with ReplayContext.create(payloads, speed=speed, sticky=sticky) as ws:
+        async with Client(None, ws, **kwargs).start() as client:
+            yield client
+
+
+def capture_payloads(directory):
+    for timestamp, room_id, line in CaptureReader(directory):
+        yield timestamp, f">{room_id}\n{line}"
+
+
+class ReplayContext(WebsocketContext):
+    def __init__(self, payloads, *, speed=None, sticky=True):
+        super().__init__(None, sticky=sticky)
+        self.payloads = payloads
+        self.speed = speed
+        self.sent = []
+        self.finished = AsyncAttribute()
+
+    @classmethod
+    @asynccontextmanager
+    async def create(cls, payloads, **kwargs):
+        yield cls(payloads, **kwargs)
+
+    async def receive_raw_spans(self):
+        loop = asyncio.get_running_loop()
+        origin = None
+
+        for timestamp, payload in self.payloads:
+            if self.speed:
+                if origin is None:
+                    origin = loop.time() - timestamp / self.speed
+                if (delay := origin + timestamp / self.speed - loop.time()) > 0:
+                    await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+
+            for span in self.decode_payload(payload):
+                yield span
+
+        self.finished.set(True)
+
+    async def send_raw_messages(self, raw_messages):
+        self.sent.extend(raw_messages)
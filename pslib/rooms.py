@@ -1,47 +1,158 @@
-__all__ = ["RoomRegistry", "Room"]
+__all__ = ["RoomPolicy", "RoomRegistry", "Room"]
 
 
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from weakref import WeakValueDictionary
+import asyncio
+import time
 
+from .battle import BattleState
 from .commands import GlobalCommandsMixin
-from .errors import ReceivedErrorMessage
-from .messages import ErrorMessage
+from .errors import PslibError
 from .state import RoomState
-from .utils import race_against
+
+
+@dataclass
+class RoomPolicy:
+    max_rooms: int = None
+    max_log_size: int = None
+    max_idle: float = None
+    prefer_finished: bool = True
+    interval: float = 10
 
 
 class RoomRegistry(dict):
-    def __init__(self, client, *, maxlogs=None):
+    def __init__(
+        self, client, *, maxlogs=None, raw_logs=False, room_class=None, policy=None
+    ):
         self.client = client
         self.maxlogs = maxlogs
+        self.raw_logs = raw_logs
+        self.room_class = room_class or Room
+        self.policy = policy
         self.temporary_rooms = WeakValueDictionary()
 
+        self.eviction_hooks = []
+        self.evicting = {}
+
     def __setitem__(self, room_id, room):
         super().__setitem__(room_id, room)
         if room_id in self.temporary_rooms:
             del self.temporary_rooms[room_id]
 
+        if self.policy and self.policy.max_rooms is not None:
+            self.enforce()
+
     def __missing__(self, room_id):
         if room := self.temporary_rooms.get(room_id):
             return room
 
-        room = Room(self.client, room_id, RoomState(maxlogs=self.maxlogs))
+        state_class = BattleState if room_id.startswith("battle-") else RoomState
+        state = state_class(maxlogs=self.maxlogs, raw_logs=self.raw_logs)
+        room = self.room_class(self.client, room_id, state)
         self.temporary_rooms[room_id] = room
         return room
 
+    def add_eviction_hook(self, callback):
+        self.eviction_hooks.append(callback)
+        return callback
+
+    def eviction_order(self):
+        rooms = [
+            room
+            for room in self.values()
+            if room is not self.client and room.id not in self.evicting
+        ]
+
+        if self.policy.prefer_finished:
+            rooms.sort(key=lambda room: (not room.state.finished, room.last_active))
+        else:
+            rooms.sort(key=lambda room: room.last_active)
+
+        return rooms
+
+    def enforce(self):
+        policy = self.policy
+        rooms = self.eviction_order()
+        evicted = set()
+
+        if policy.max_idle is not None:
+            now = time.monotonic()
+            evicted.update(
+                room for room in rooms if now - room.last_active > policy.max_idle
+            )
+
+        if policy.max_rooms is not None:
+            excess = len(rooms) - policy.max_rooms
+            for room in rooms:
+                if len(evicted) >= excess:
+                    break
+                evicted.add(room)
+
+        if policy.max_log_size is not None:
+            size = sum(room.state.logs.size for room in rooms if room not in evicted)
+            for room in rooms:
+                if size <= policy.max_log_size:
+                    break
+                if room not in evicted:
+                    evicted.add(room)
+                    size -= room.state.logs.size
+
+        for room in rooms:
+            if room in evicted:
+                self.evict(room)
+
+    def evict(self, room):
+        if room.id not in self.evicting:
+            task = asyncio.create_task(self._evict(room))
+            self.evicting[room.id] = task
+            task.add_done_callback(lambda _: self.evicting.pop(room.id, None))
+
+    async def _evict(self, room):
+        for hook in self.eviction_hooks:
+            try:
+                if asyncio.iscoroutine(result := hook(room)):
+                    await result
+            except Exception as exc:
+                asyncio.get_running_loop().call_exception_handler(
+                    {
+                        "message": f"Unhandled exception in eviction hook {hook!r}",
+                        "exception": exc,
+                        "room": room,
+                    }
+                )
+
+        if room.joined:
+            try:
+                await room.leave()
+            except PslibError:
+                room.handle_leave()
+
+    async def sweep(self):
+        while True:
+            await asyncio.sleep(self.policy.interval)
+            self.enforce()
+
 
 class Room(GlobalCommandsMixin):
     def __init__(self, client, room_id, state):
         self.client = client
         self.id = room_id
         self.state = state
+        self.state.bind(self)
 
         self.joined = False
+        self.last_active = time.monotonic()
 
     def handle_message(self, message):
+        self.last_active = time.monotonic()
         self.state.handle_message(message)
 
+    def skip_message(self, raw_message):
+        self.last_active = time.monotonic()
+        self.state.skip_message(raw_message)
+
     def handle_join(self):
         self.joined = True
 
@@ -50,47 +161,71 @@ class Room(GlobalCommandsMixin):
     def handle_leave(self):
         self.joined = False
         self.reset_state()
+        self.client.presence.discard_room(self.id)
 
         if self.id in self.client.rooms:
             del self.client.rooms[self.id]
 
     def reset_state(self):
         if self.id:
-            self.state = type(self.state)(maxlogs=self.state.maxlogs)
+            self.state = type(self.state)(
+                maxlogs=self.state.maxlogs, raw_logs=self.state.raw_logs
+            )
+            self.state.bind(self)
+
+    @property
+    def users(self):
+        return self.client.presence.users(self.id)
 
     @property
     def logs(self):
-        return "\n".join(message.serialize() or "|" for message in self.state.logs)
+        return self.state.logs.serialize()
 
-    async def listen(self, *message_types, all_rooms=False):
-        async for message in self.client.received_messages.listen(*message_types):
-            if all_rooms or message.room.id == self.id:
-                yield message
+    def listen(self, *message_types, all_rooms=False, **options):
+        return self.client.received_messages.listen(
+            *message_types, room_id=None if all_rooms else self.id, **options
+        )
 
-    async def expect(self, *message_types, all_rooms=False, **attrs):
-        async for message in self.listen(*message_types, all_rooms=all_rooms):
-            if all(
-                hasattr(message, key) and getattr(message, key) == value
-                for key, value in attrs.items()
-            ):
-                return message
+    def listen_batches(
+        self, *message_types, all_rooms=False, max_size=None, max_delay=0, **options
+    ):
+        listener = self.listen(*message_types, all_rooms=all_rooms, **options)
+        return listener.batches(max_size, max_delay)
+
+    def add_handler(self, callback, *message_types, all_rooms=False, **options):
+        return self.client.received_messages.add_handler(
+            callback, *message_types, room_id=None if all_rooms else self.id, **options
+        )
 
-    async def _raise_error_message(self):
-        message = await self.expect(ErrorMessage)
-        raise ReceivedErrorMessage(message.error)
+    def on(self, *message_types, all_rooms=False, **options):
+        def decorator(callback):
+            self.add_handler(callback, *message_types, all_rooms=all_rooms, **options)
+            return callback
+
+        return decorator
+
+    async def expect(self, *message_types, all_rooms=False, **attrs):
+        return await self.client.received_messages.expect(
+            *message_types, room_id=None if all_rooms else self.id, **attrs
+        )
 
     @asynccontextmanager
-    async def check_message(self, message_text):
-        async with self.client.sent_messages.append(f"{self.id}|{message_text}"):
-            async with race_against(self._raise_error_message()):
-                yield
+    async def check_message(self, message_text, *, key=None, error_filter=None):
+        raw_message = f"{self.id}|{message_text}"
+
+        async with self.client.sent_messages.append(
+            raw_message, key=key, error_filter=error_filter
+        ):
+            yield
 
     @asynccontextmanager
-    async def check_command(self, command_name, *command_params):
+    async def check_command(
+        self, command_name, *command_params, key=None, error_filter=None
+    ):
         text = f"/{command_name}"
 
         if command_params:
             text += " " + ",".join(map(str, command_params))
 
-        async with self.check_message(text):
+        async with self.check_message(text, key=key, error_filter=error_filter):
             yield
@@ -1,4 +1,4 @@
-__all__ = ["RoomState", "ClientState"]
+__all__ = ["MessageLog", "RawMessageLog", "RoomState", "ClientState"]
 
 
 from collections import deque
@@ -6,6 +6,8 @@ from dataclasses import dataclass
 import asyncio
 
 from .messages import (
+    parse_message,
+    MESSAGE_CLASS_REGISTRY,
     UpdateUserMessage,
     ChallstrMessage,
     InitMessage,
@@ -13,20 +15,90 @@ from .messages import (
     TitleMessage,
     UsersMessage,
     DeinitMessage,
+    WinMessage,
 )
 from .utils import AsyncAttribute
 
 
+class MessageLog(deque):
+    def __init__(self, iterable=(), maxlen=None, registry=None, room=None):
+        super().__init__(maxlen=maxlen)
+        self.registry = registry
+        self.room = room
+        self.size = 0
+        self.extend(iterable)
+
+    def append(self, message):
+        if self.maxlen == 0:
+            return
+        if len(self) == self.maxlen:
+            self.size -= len(self[0].value)
+
+        super().append(message)
+        self.size += len(message.value)
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def append_line(self, line):
+        if self.maxlen != 0:
+            self.append(
+                parse_message(line, self.room, lazy=True, registry=self.registry)
+            )
+
+    def serialize(self):
+        return "\n".join(message.serialize() or "|" for message in self)
+
+
+class RawMessageLog:
+    def __init__(self, maxlen=None, registry=None, room=None):
+        self.lines = deque(maxlen=maxlen)
+        self.registry = registry
+        self.room = room
+        self.size = 0
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        for line in self.lines:
+            yield parse_message(line, self.room, lazy=True, registry=self.registry)
+
+    def append(self, message):
+        self.append_line(message.serialize() or "|")
+
+    def append_line(self, line):
+        if self.lines.maxlen == 0:
+            return
+        if len(self.lines) == self.lines.maxlen:
+            self.size -= len(self.lines[0])
+
+        self.lines.append(line)
+        self.size += len(line)
+
+    def serialize(self):
+        return "\n".join(self.lines)
+
+
 class RoomState:
-    def __init__(self, *, maxlogs=None):
+    registry = MESSAGE_CLASS_REGISTRY
+    needs = (InitMessage, NoInitMessage, TitleMessage, UsersMessage, WinMessage)
+
+    def __init__(self, *, maxlogs=None, raw_logs=False):
         self.maxlogs = maxlogs
-        self.logs = deque(maxlen=maxlogs)
+        self.raw_logs = raw_logs
+        self.logs = (RawMessageLog if raw_logs else MessageLog)(
+            maxlen=maxlogs, registry=self.registry
+        )
 
         self.joined = AsyncAttribute()
         self.roomtype = AsyncAttribute()
         self.title = AsyncAttribute()
         self.userlist = AsyncAttribute()
 
+        self.finished = False
+
     def handle_message(self, message):
         self.logs.append(message)
 
@@ -43,6 +115,15 @@ class RoomState:
         elif isinstance(message, UsersMessage):
             self.userlist.set(message.userlist)
 
+        elif isinstance(message, WinMessage):
+            self.finished = True
+
+    def skip_message(self, raw_message):
+        self.logs.append_line(raw_message)
+
+    def bind(self, room):
+        self.logs.room = room
+
 
 class ClientState(RoomState):
     @dataclass
@@ -52,6 +133,8 @@ class ClientState(RoomState):
         avatar: int
         settings: dict
 
+    needs = (*RoomState.needs, UpdateUserMessage, ChallstrMessage)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -0,0 +1,297 @@
+__all__ = ["connect_supervisor", "ClientSupervisor", "WorkerRoom"]
+
+
+from contextlib import asynccontextmanager
+from itertools import count
+import asyncio
+import multiprocessing
+import sys
+
+from .client import Client
+from .errors import PslibError, InvalidRoomId, ServerConnectionClosed
+from .message_managers import InboundMessageManager
+from .messages import parse_message
+from .presence import PresenceIndex
+from .rooms import RoomRegistry, Room
+from .state import RoomState
+from .utils import concurrent_tasks
+
+
+@asynccontextmanager
+async def connect_supervisor(processes, server="showdown", **kwargs):
+    async with ClientSupervisor.connect(processes, server, **kwargs) as supervisor:
+        yield supervisor
+
+
+async def _join(client, room_id):
+    room = await client.join(room_id)
+    return room.id
+
+
+async def _leave(client, room_id):
+    await client.leave(room_id)
+
+
+async def _query_battles(client, *args):
+    return [battle.id for battle in await client.query_battles(*args)]
+
+
+WORKER_COMMANDS = {"join": _join, "leave": _leave, "query_battles": _query_battles}
+
+
+SELECTABLE_PIPES = sys.platform != "win32"
+
+
+async def receive(connection):
+    loop = asyncio.get_running_loop()
+
+    if not SELECTABLE_PIPES:
+        return await loop.run_in_executor(None, connection.recv)
+
+    fd = connection.fileno()
+
+    while not connection.poll():
+        readable = loop.create_future()
+
+        try:
+            loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        except NotImplementedError:
+            return await loop.run_in_executor(None, connection.recv)
+
+        try:
+            await readable
+        finally:
+            loop.remove_reader(fd)
+
+    return connection.recv()
+
+
+def run_worker(connection, forward, credential, kwargs):
+    asyncio.run(serve_worker(connection, forward, credential, kwargs))
+
+
+async def serve_worker(connection, forward, credential, kwargs):
+    loop = asyncio.get_running_loop()
+    pending = []
+    tasks = set()
+
+    def flush():
+        connection.send(("lines", pending.copy()))
+        pending.clear()
+
+    async def forward_messages(client):
+        async for message in client.listen(*forward, all_rooms=True):
+            if not pending:
+                loop.call_soon(flush)
+            pending.append((message.room.id or "lobby", message.serialize()))
+
+    async def handle_request(client, name, request_id, args):
+        try:
+            result, error = await WORKER_COMMANDS[name](client, *args), None
+        except Exception as exc:
+            result, error = None, exc
+
+        try:
+            connection.send(("result", request_id, result, error))
+        except Exception:
+            error = PslibError(f"Worker request failed: {error!r}")
+            connection.send(("result", request_id, None, error))
+
+    async with Client.connect(**kwargs) as client:
+        if credential:
+            await client.login(*credential)
+
+        async with concurrent_tasks(forward_messages(client)):
+            while True:
+                try:
+                    request = await receive(connection)
+                except EOFError:
+                    break
+
+                if request[0] == "stop":
+                    break
+
+                task = asyncio.create_task(handle_request(client, *request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+
+class WorkerHandle:
+    def __init__(self, process, connection):
+        self.process = process
+        self.connection = connection
+        self.requests = {}
+        self.request_ids = count()
+        self.rooms = set()
+        self.closed = False
+
+    async def request(self, name, *args):
+        if self.closed:
+            raise ServerConnectionClosed("Worker connection closed")
+
+        request_id = next(self.request_ids)
+        future = self.requests[request_id] = asyncio.get_running_loop().create_future()
+
+        try:
+            self.connection.send((name, request_id, args))
+        except (BrokenPipeError, OSError) as exc:
+            del self.requests[request_id]
+            self.close()
+            raise ServerConnectionClosed("Worker connection closed") from exc
+
+        try:
+            return await future
+        finally:
+            del self.requests[request_id]
+
+    def handle_result(self, request_id, result, error):
+        if (future := self.requests.get(request_id)) and not future.done():
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def close(self):
+        self.closed = True
+
+        for future in self.requests.values():
+            if not future.done():
+                future.set_exception(ServerConnectionClosed("Worker connection closed"))
+
+    def stop(self):
+        try:
+            self.connection.send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+
+
+class WorkerRoom(Room):
+    async def join(self, room_id=None):
+        return await self.client.join(room_id or self.id)
+
+    async def leave(self, room_id=None):
+        await self.client.leave(room_id or self.id)
+
+
+class ClientSupervisor(Room):
+    def __init__(self, workers, *, lazy=True):
+        super().__init__(self, "", RoomState(maxlogs=0))
+
+        self.rooms = RoomRegistry(self, maxlogs=0, room_class=WorkerRoom)
+        self.rooms["lobby"] = self
+
+        self.presence = PresenceIndex()
+
+        self.received_messages = InboundMessageManager()
+        self.workers = workers
+        self.lazy = lazy
+
+    @classmethod
+    @asynccontextmanager
+    async def connect(
+        cls,
+        processes,
+        server="showdown",
+        *,
+        forward=(),
+        credentials=(),
+        lazy=True,
+        context=None,
+        **kwargs,
+    ):
+        context = context or multiprocessing.get_context("spawn")
+        credentials = list(credentials)
+        workers = []
+
+        try:
+            for i in range(processes):
+                connection, worker_connection = context.Pipe()
+                credential = credentials[i] if i < len(credentials) else None
+
+                process = context.Process(
+                    target=run_worker,
+                    args=(
+                        worker_connection,
+                        tuple(forward),
+                        credential,
+                        dict(kwargs, server=server),
+                    ),
+                    daemon=True,
+                )
+                process.start()
+                worker_connection.close()
+
+                workers.append(WorkerHandle(process, connection))
+
+            async with cls(workers, lazy=lazy).start() as supervisor:
+                yield supervisor
+        finally:
+            loop = asyncio.get_running_loop()
+
+            for worker in workers:
+                worker.stop()
+                await loop.run_in_executor(None, worker.process.join, 5)
+
+    @asynccontextmanager
+    async def start(self):
+        async with concurrent_tasks(*map(self._receive_messages, self.workers)):
+            yield self
+
+    async def _receive_messages(self, worker):
+        while True:
+            try:
+                kind, *data = await receive(worker.connection)
+            except (EOFError, OSError):
+                worker.close()
+                break
+
+            if kind == "lines":
+                for room_id, raw_message in data[0]:
+                    room = self.rooms[room_id]
+                    message = parse_message(
+                        raw_message, room, lazy=self.lazy, registry=room.state.registry
+                    )
+                    self.presence.handle_message(message)
+                    self.received_messages.dispatch(message)
+
+                if self.received_messages.blocked:
+                    await self.received_messages.drain()
+
+            elif kind == "result":
+                worker.handle_result(*data)
+
+    def worker(self, room_id):
+        for worker in self.workers:
+            if room_id in worker.rooms:
+                return worker
+
+        return min(self.workers, key=lambda worker: len(worker.rooms))
+
+    async def join(self, room_id=None):
+        if not room_id:
+            raise InvalidRoomId("Expected valid room id")
+
+        worker = self.worker(room_id)
+        await worker.request("join", room_id)
+        worker.rooms.add(room_id)
+
+        room = self.rooms[room_id]
+        room.handle_join()
+        return room
+
+    async def leave(self, room_id=None):
+        if not room_id:
+            raise InvalidRoomId("Expected valid room id")
+
+        worker = self.worker(room_id)
+        await worker.request("leave", room_id)
+        worker.rooms.discard(room_id)
+
+        self.rooms[room_id].handle_leave()
+
+    async def query_battles(self, format="", minimum_elo=None, username_prefix=""):
+        worker = min(self.workers, key=lambda worker: len(worker.rooms))
+        battle_ids = await worker.request(
+            "query_battles", format, minimum_elo, username_prefix
+        )
+        return [self.rooms[battle_id] for battle_id in battle_ids]
@@ -1,9 +1,22 @@
-__all__ = ["compose", "concurrent_tasks", "into_id", "AsyncAttribute", "race_against"]
+__all__ = [
+    "compose",
+    "concurrent_tasks",
+    "into_id",
+    "AsyncAttribute",
+    "race_against",
+    "TokenBucket",
+    "DeadlineScheduler",
+]
 
 
 import re
+import sys
+import time
 import asyncio
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from heapq import heappush, heappop
+from itertools import count
 
 
 def compose(*funcs):
@@ -31,8 +44,22 @@ async def concurrent_tasks(*coroutines):
                 pass
 
 
+ID_PATTERN = re.compile(r"(\W|_)")
+ASCII_ID_TABLE = str.maketrans(
+    "", "", "".join(char for char in map(chr, range(128)) if not char.isalnum())
+)
+
+
+@lru_cache(maxsize=8192)
 def into_id(string):
-    return re.sub(r"(\W|_)", "", string.lower())
+    string = string.lower()
+
+    if not string.isascii():
+        string = ID_PATTERN.sub("", string)
+    elif not string.isalnum():
+        string = string.translate(ASCII_ID_TABLE)
+
+    return sys.intern(string)
 
 
 class AsyncAttribute:
@@ -71,3 +98,89 @@ async def race_against(coroutine):
 
         if exc := coroutine_task.exception():
             raise exc from None
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=1, *, minimum_rate=None, recovery=None):
+        self.rate = self.maximum_rate = rate
+        self.burst = burst
+        self.minimum_rate = rate / 8 if minimum_rate is None else minimum_rate
+        self.recovery = rate / 10 if recovery is None else recovery
+
+        self.tokens = burst
+        self.timestamp = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        elapsed = now - self.timestamp
+        self.timestamp = now
+
+        if self.rate < self.maximum_rate:
+            self.rate = min(self.maximum_rate, self.rate + self.recovery * elapsed)
+
+        self.tokens = min(self.burst, self.tokens + self.rate * elapsed)
+
+    @property
+    def budget(self):
+        self.refill()
+        return self.tokens
+
+    def reserve(self):
+        self.refill()
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while delay := self.reserve():
+            await asyncio.sleep(delay)
+
+    def throttle(self):
+        self.refill()
+        self.rate = max(self.minimum_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+
+
+class DeadlineScheduler:
+    def __init__(self):
+        self.heap = []
+        self.handle = None
+        self.counter = count()
+
+    def schedule(self, delay, callback, *args):
+        loop = asyncio.get_running_loop()
+        entry = [loop.time() + delay, next(self.counter), callback, args]
+
+        heappush(self.heap, entry)
+
+        if self.heap[0] is entry:
+            self.rearm(loop)
+
+        return entry
+
+    def cancel(self, entry):
+        entry[2] = None
+
+    def rearm(self, loop):
+        if self.handle:
+            self.handle.cancel()
+
+        while self.heap and self.heap[0][2] is None:
+            heappop(self.heap)
+
+        self.handle = loop.call_at(self.heap[0][0], self.run) if self.heap else None
+
+    def run(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        while self.heap and self.heap[0][0] <= now:
+            _, _, callback, args = heappop(self.heap)
+            if callback:
+                callback(*args)
+
+        self.handle = None
+        self.rearm(loop)
@@ -0,0 +1,207 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from pslib import (
+    Client,
+    parse_message,
+    BattleProtocolMessage,
+    DamageMessage,
+    MoveMessage,
+    RequestMessage,
+    UnrecognizedMessage,
+)
+from pslib.battle import BattleState, Pokemon
+from pslib.state import RoomState
+
+
+pytestmark = pytest.mark.asyncio
+
+
+BATTLE_LOG = """\
+|init|battle
+|title|Alice vs. Bob
+|j|☆Alice
+|j|☆Bob
+|gametype|singles
+|player|p1|Alice|102|1500
+|player|p2|Bob|1|
+|teamsize|p1|2
+|teamsize|p2|1
+|poke|p1|Pikachu, M|
+|poke|p1|Charizard, F|
+|poke|p2|Snorlax, M|
+|start
+|switch|p1a: Sparky|Pikachu, L50, M|100/100
+|switch|p2a: Snorlax|Snorlax, M|100/100
+|turn|1
+|move|p1a: Sparky|Thunderbolt|p2a: Snorlax
+|-damage|p2a: Snorlax|60/100
+|-status|p2a: Snorlax|par
+|-weather|RainDance
+|turn|2
+|switch|p1a: Charizard|Charizard, F|100/100
+|-damage|p1a: Charizard|40/100|[from] item: Life Orb
+|-curestatus|p2a: Snorlax|par
+|-heal|p2a: Snorlax|80/100 par
+|turn|3
+|-weather|none
+|faint|p1a: Charizard
+|win|Bob"""
+
+
+async def test_battle_state_tracking():
+    client = Client(None, None)
+    room = client.rooms["battle-gen8ou-1"]
+
+    for line in BATTLE_LOG.splitlines():
+        room.handle_message(parse_message(line, room, registry=room.state.registry))
+
+    state = room.state
+    assert isinstance(state, BattleState)
+    assert type(client.rooms["help"].state) is RoomState
+
+    current = state.snapshot()
+    assert current.turn == 3
+    assert current.weather == ""
+    assert current.winner == "bob"
+
+    p1, p2 = current.side("p1"), current.side("p2")
+    assert (p1.username, p1.rating, p1.teamsize) == ("Alice", 1500, 2)
+    assert (p2.username, p2.rating) == ("Bob", None)
+    assert [pokemon.name for pokemon in p1.pokemon] == ["Sparky", "Charizard"]
+    assert p1.get("Charizard").fainted
+    assert p2.get("Snorlax") == Pokemon(
+        "Snorlax", "Snorlax", "Snorlax, M", 80, 100, "par", False
+    )
+    assert current.active["p1"] == [p1.get("Charizard")]
+
+
+async def test_battle_snapshots():
+    client = Client(None, None)
+    room = client.rooms["battle-gen8ou-1"]
+
+    for line in BATTLE_LOG.splitlines():
+        room.handle_message(parse_message(line, room, registry=room.state.registry))
+
+    turn1, turn2 = room.state.snapshot(1), room.state.snapshot(2)
+    assert turn1.side("p2").get("Snorlax").hp == 100
+    assert turn2.side("p2").get("Snorlax").hp == 60
+    assert turn2.side("p2").get("Snorlax").status == "par"
+    assert turn2.weather == "RainDance"
+    assert turn1.side("p1").active == ("Sparky",)
+    assert turn2.side("p1").pokemon[0] is turn1.side("p1").pokemon[0]
+
+
+async def test_battle_corpus():
+    client = Client(None, None)
+    room = client.rooms["battle-gen8ou-2"]
+
+    with open(Path(__file__).parent / "data" / "battle.log", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    for line in lines:
+        message = parse_message(line, room, registry=room.state.registry)
+        room.handle_message(message)
+
+        if line.startswith("|-") or line.startswith("|move|"):
+            assert isinstance(message, BattleProtocolMessage)
+
+    current = room.state.snapshot()
+    assert current.turn == 4
+    assert current.winner == "bob"
+    assert current.side("p2").get("Gengar").details == "Gengar-Mega, M"
+    assert current.side("p2").get("Gengar").hp == 88
+    assert all(pokemon.fainted for pokemon in current.side("p1").pokemon)
+    assert room.state.snapshot(2).weather == "RainDance"
+    assert room.state.snapshot(2).side("p2").get("Snorlax").status == "par"
+
+    request = next(m for m in room.state.logs if isinstance(m, RequestMessage))
+    assert request.request["side"]["id"] == "p1"
+
+
+async def test_team_preview_wildcards():
+    client = Client(None, None)
+    room = client.rooms["battle-gen8ou-3"]
+
+    for line in [
+        "|poke|p1|Urshifu-*, L50, M|",
+        "|poke|p1|Pikachu, M|",
+        "|switch|p1a: Urshifu|Urshifu-Rapid-Strike, L50, M|100/100",
+    ]:
+        room.handle_message(parse_message(line, room, registry=room.state.registry))
+
+    p1 = room.state.snapshot().side("p1")
+    assert [pokemon.name for pokemon in p1.pokemon] == ["Urshifu", "Pikachu"]
+    assert p1.get("Urshifu").species == "Urshifu-Rapid-Strike"
+
+
+async def test_sibling_message_classes():
+    pairs = [
+        ("|-damage|p1a: Sparky|40/100", "|-heal|p1a: Sparky|60/100"),
+        ("|-damage|p1a: Sparky|40/100", "|-sethp|p1a: Sparky|60/100"),
+        ("|-status|p1a: Sparky|par", "|-curestatus|p1a: Sparky|par"),
+        ("|-boost|p1a: Sparky|atk|1", "|-unboost|p1a: Sparky|atk|1"),
+        ("|-crit|p2a: Snorlax", "|-supereffective|p2a: Snorlax"),
+        ("|-crit|p2a: Snorlax", "|-immune|p2a: Snorlax"),
+        ("|-item|p2a: Snorlax|Leftovers", "|-enditem|p2a: Snorlax|Leftovers"),
+        ("|-fieldstart|move: Grassy Terrain", "|-fieldend|move: Grassy Terrain"),
+        ("|-sidestart|p1: Alice|Spikes", "|-sideend|p1: Alice|Spikes"),
+        ("|-start|p2a: Snorlax|Substitute", "|-end|p2a: Snorlax|Substitute"),
+    ]
+
+    for first, second in pairs:
+        first = parse_message(first, registry=BattleState.registry)
+        second = parse_message(second, registry=BattleState.registry)
+
+        assert isinstance(second, BattleProtocolMessage)
+        assert not isinstance(second, type(first))
+        assert type(second).fields == type(first).fields
+
+
+async def test_keyword_suffixes():
+    message = parse_message(
+        "|-damage|p1a: Sparky|40/100|[from] item: Life Orb|[of] p2a: Snorlax|[still]",
+        registry=BattleState.registry,
+    )
+
+    assert isinstance(message, DamageMessage)
+    assert message.condition == "40/100"
+    assert message.keywords == {
+        "from": "item: Life Orb",
+        "of": "p2a: Snorlax",
+        "still": "",
+    }
+    assert isinstance(parse_message("|-damage|p1a: Sparky|40/100"), UnrecognizedMessage)
+
+
+async def test_demand_driven_parsing():
+    with open(Path(__file__).parent / "data" / "battle.log", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    async def receive_raw_spans():
+        for line in lines:
+            yield "battle-gen8ou-4", line, 0, len(line)
+
+    ws = SimpleNamespace(receive_raw_spans=receive_raw_spans)
+    client = Client(None, ws, raw_logs=True, demand_driven=True)
+    room = client.rooms["battle-gen8ou-4"]
+
+    assert not client.wants(MoveMessage, room.state)
+    assert client.wants(DamageMessage, room.state)
+
+    listener = room.listen(MoveMessage)
+    assert client.wants(MoveMessage, room.state)
+
+    await client._receive_messages()
+
+    assert room.state.logs.serialize() == "\n".join(lines)
+    assert room.state.snapshot().winner == "bob"
+    assert [message.move for message in listener.buffer] == [
+        "Thunderbolt",
+        "Curse",
+        "Flamethrower",
+        "Shadow Ball",
+        "Shadow Ball",
+    ]
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from pslib import CaptureWriter, CaptureReader
+
+
+RECORDS = [
+    (1.0, "lobby", "|c|foo|hello"),
+    (2.0, "battle-gen8ou-1", "|init|battle"),
+    (3.0, "lobby", "|c|bar|world"),
+    (4.0, "battle-gen8ou-1", "|turn|1"),
+    (5.0, "lobby", "|j|☆foo"),
+]
+
+
+def write_records(directory, **options):
+    writer = CaptureWriter(directory, **options)
+    for timestamp, room_id, line in RECORDS:
+        writer.write(room_id, line, timestamp)
+    writer.close()
+
+
+def test_segments_and_index(tmp_path):
+    write_records(tmp_path, segment_size=64, flush_size=1)
+    reader = CaptureReader(tmp_path)
+
+    assert len(reader.segments()) > 1
+    assert list(reader) == RECORDS
+    assert reader.rooms() == ["battle-gen8ou-1", "lobby"]
+    assert list(reader.room("lobby")) == [r for r in RECORDS if r[1] == "lobby"]
+
+
+def test_rebuild_missing_index(tmp_path):
+    write_records(tmp_path)
+    for path in tmp_path.glob("*.idx"):
+        path.unlink()
+
+    reader = CaptureReader(tmp_path)
+    assert list(reader.room("battle-gen8ou-1")) == [RECORDS[1], RECORDS[3]]
+
+
+def test_append_new_segments(tmp_path):
+    write_records(tmp_path)
+    write_records(tmp_path)
+
+    reader = CaptureReader(tmp_path)
+    assert len(reader.segments()) == 2
+    assert list(reader) == RECORDS * 2
+
+
+@pytest.mark.asyncio
+async def test_periodic_flush(tmp_path):
+    writer = CaptureWriter(tmp_path)
+    task = asyncio.create_task(writer.run(interval=0.01))
+
+    writer.write("lobby", "|c|foo|hello", 1.0)
+    await asyncio.sleep(0.05)
+    assert list(CaptureReader(tmp_path)) == [(1.0, "lobby", "|c|foo|hello")]
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert writer.closed
+    assert list(tmp_path.glob("*.idx"))
+
+
+@pytest.mark.asyncio
+async def test_write_errors_surface(tmp_path, monkeypatch):
+    writer = CaptureWriter(tmp_path, flush_size=1)
+
+    def append(segment, data):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(writer, "_append", append)
+    task = asyncio.create_task(writer.run(interval=0.01))
+
+    writer.write("lobby", "|c|foo|hello", 1.0)
+
+    with pytest.raises(OSError, match="disk full"):
+        await asyncio.wait_for(task, 0.5)
+
+    assert writer.closed
@@ -0,0 +1,573 @@
+import pytest
+import asyncio
+import gc
+from types import SimpleNamespace
+
+from pslib import (
+    parse_message,
+    ChatMessage,
+    TimestampChatMessage,
+    InitMessage,
+    JoinMessage,
+    QueryResponseMessage,
+    ReceivedErrorMessage,
+    ServerResponseTimeout,
+)
+from pslib.message_managers import InboundMessageManager, OutboundMessageManager
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_message(raw_message, room_id="lobby"):
+    message = parse_message(raw_message)
+    message.room = SimpleNamespace(id=room_id)
+    return message
+
+
+async def collect(iterator, count):
+    return [await iterator.__anext__() for _ in range(count)]
+
+
+async def test_dispatch_by_type():
+    manager = InboundMessageManager()
+    listener = manager.listen(JoinMessage)
+    pending = asyncio.create_task(collect(listener, 1))
+    await asyncio.sleep(0)
+
+    manager.dispatch(make_message("|c|foo|hello"))
+    manager.dispatch(make_message("|j|foo"))
+
+    assert [message.joined for message in await pending] == ["foo"]
+
+
+async def test_dispatch_by_room():
+    manager = InboundMessageManager()
+    listener = manager.listen(room_id="help")
+    pending = asyncio.create_task(collect(listener, 2))
+    await asyncio.sleep(0)
+
+    manager.dispatch(make_message("|j|foo", "lobby"))
+    manager.dispatch(make_message("|j|bar", "help"))
+    manager.dispatch(make_message("|l|bar", "help"))
+
+    assert [message.type for message in await pending] == ["j", "l"]
+
+
+async def test_dispatch_subclass_once():
+    manager = InboundMessageManager()
+    listener = manager.listen(ChatMessage, TimestampChatMessage)
+    pending = asyncio.create_task(collect(listener, 2))
+    await asyncio.sleep(0)
+
+    manager.dispatch(make_message("|c:|1|foo|hello"))
+    manager.dispatch(make_message("|c|foo|world"))
+
+    assert [message.content for message in await pending] == ["hello", "world"]
+
+
+async def test_unregister_on_close():
+    manager = InboundMessageManager()
+    listener = manager.listen(JoinMessage, room_id="help")
+    pending = asyncio.create_task(collect(listener, 1))
+    await asyncio.sleep(0)
+
+    manager.dispatch(make_message("|j|foo", "help"))
+    await pending
+    await listener.aclose()
+
+    assert not manager.listeners
+
+
+async def test_prune_collected_listeners():
+    manager = InboundMessageManager()
+
+    for i in range(100):
+        manager.listen(JoinMessage, room_id=f"battle-{i}")
+    manager.dispatch(make_message("|j|foo", "battle-0"))
+    gc.collect()
+
+    assert not manager.listeners
+    assert manager.resolve(JoinMessage) == ()
+
+
+async def test_overflow_drop_oldest():
+    manager = InboundMessageManager()
+    listener = manager.listen(JoinMessage, maxsize=2, overflow="drop_oldest")
+
+    for userid in ["foo", "bar", "baz"]:
+        manager.dispatch(make_message(f"|j|{userid}"))
+
+    assert [message.joined for message in await collect(listener, 2)] == [
+        "bar",
+        "baz",
+    ]
+    assert listener.dropped == manager.dropped == 1
+
+
+async def test_overflow_drop_newest():
+    manager = InboundMessageManager()
+    listener = manager.listen(JoinMessage, maxsize=2, overflow="drop_newest")
+
+    for userid in ["foo", "bar", "baz"]:
+        manager.dispatch(make_message(f"|j|{userid}"))
+
+    assert [message.joined for message in await collect(listener, 2)] == [
+        "foo",
+        "bar",
+    ]
+    assert listener.dropped == 1
+
+
+async def test_overflow_coalesce():
+    manager = InboundMessageManager()
+    listener = manager.listen(
+        ChatMessage, overflow="coalesce", key=lambda message: message.sender
+    )
+
+    for raw_message in ["|c|foo|a", "|c|bar|b", "|c|foo|c"]:
+        manager.dispatch(make_message(raw_message))
+
+    assert [message.content for message in await collect(listener, 2)] == ["c", "b"]
+    assert listener.dropped == 1
+
+
+async def test_overflow_block():
+    manager = InboundMessageManager()
+    listener = manager.listen(JoinMessage, maxsize=1)
+
+    manager.dispatch(make_message("|j|foo"))
+    manager.dispatch(make_message("|j|bar"))
+
+    assert listener.qsize() == 1
+    assert listener.delayed == 1
+
+    draining = asyncio.create_task(manager.drain())
+    await asyncio.sleep(0)
+    assert not draining.done()
+
+    assert [message.joined for message in await collect(listener, 2)] == [
+        "foo",
+        "bar",
+    ]
+    await draining
+
+
+async def test_overflow_block_cancelled_consumer():
+    manager = InboundMessageManager()
+
+    async def consume():
+        async for message in manager.listen(JoinMessage, maxsize=1):
+            await asyncio.sleep(1)
+
+    consumer = asyncio.create_task(consume())
+    await asyncio.sleep(0)
+
+    for userid in ["foo", "bar", "baz"]:
+        manager.dispatch(make_message(f"|j|{userid}"))
+
+    consumer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await consumer
+    del consumer
+    gc.collect()
+
+    await asyncio.wait_for(manager.drain(), 0.5)
+    assert not manager.blocked
+
+
+async def test_overflow_block_closed_listener():
+    manager = InboundMessageManager()
+    listener = manager.listen(JoinMessage, maxsize=1)
+
+    manager.dispatch(make_message("|j|foo"))
+    manager.dispatch(make_message("|j|bar"))
+
+    draining = asyncio.create_task(manager.drain())
+    await asyncio.sleep(0)
+    await listener.aclose()
+
+    await asyncio.wait_for(draining, 0.5)
+    assert listener.qsize() == 1
+
+
+async def test_batches_max_size():
+    manager = InboundMessageManager()
+    batches = manager.listen(JoinMessage).batches(max_size=2)
+
+    for userid in ["foo", "bar", "baz"]:
+        manager.dispatch(make_message(f"|j|{userid}"))
+
+    assert [len(batch) for batch in await collect(batches, 2)] == [2, 1]
+
+
+async def test_batches_max_delay():
+    manager = InboundMessageManager()
+    listener = manager.listen(JoinMessage)
+    pending = asyncio.create_task(listener.get_batch(max_size=3, max_delay=0.05))
+
+    manager.dispatch(make_message("|j|foo"))
+    await asyncio.sleep(0.01)
+    manager.dispatch(make_message("|j|bar"))
+    await asyncio.sleep(0.01)
+
+    assert not pending.done()
+
+    manager.dispatch(make_message("|j|baz"))
+    await asyncio.sleep(0)
+
+    assert [message.joined for message in await pending] == ["foo", "bar", "baz"]
+
+
+async def test_batches_timeout():
+    manager = InboundMessageManager()
+    listener = manager.listen(JoinMessage)
+    pending = asyncio.create_task(listener.get_batch(max_size=3, max_delay=0.01))
+
+    manager.dispatch(make_message("|j|foo"))
+    await asyncio.sleep(0.05)
+
+    assert [message.joined for message in pending.result()] == ["foo"]
+
+
+async def test_handlers_order():
+    manager = InboundMessageManager()
+    calls = []
+
+    manager.add_handler(lambda message: calls.append(("any", message.type)))
+    manager.add_handler(
+        lambda message: calls.append(("join", message.joined)), JoinMessage
+    )
+    manager.add_handler(
+        lambda message: calls.append(("help", message.type)), room_id="help"
+    )
+
+    manager.dispatch(make_message("|j|foo"))
+    manager.dispatch(make_message("|c|foo|hello", "help"))
+
+    assert calls == [("any", "j"), ("join", "foo"), ("any", "c"), ("help", "c")]
+
+
+async def test_handlers_isolation():
+    manager = InboundMessageManager()
+    calls = []
+
+    def broken(message):
+        raise ValueError(message.type)
+
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: None)
+
+    handler = manager.add_handler(broken)
+    manager.add_handler(calls.append)
+    manager.dispatch(make_message("|j|foo"))
+
+    assert handler.errors == 1
+    assert len(calls) == 1
+
+
+async def test_coroutine_handlers():
+    manager = InboundMessageManager()
+    calls = []
+
+    async def handle(message):
+        await asyncio.sleep(0)
+        calls.append(message.joined)
+
+    handler = manager.add_handler(handle, JoinMessage)
+
+    for userid in ["foo", "bar", "baz"]:
+        manager.dispatch(make_message(f"|j|{userid}"))
+
+    await asyncio.sleep(0.01)
+    handler.remove()
+
+    assert calls == ["foo", "bar", "baz"]
+    assert not manager.handlers
+
+
+async def test_coroutine_handlers_restart_worker():
+    manager = InboundMessageManager()
+    calls = []
+
+    async def handle(message):
+        calls.append(message.joined)
+
+    manager.add_handler(handle, JoinMessage)
+
+    manager.dispatch(make_message("|j|foo"))
+    asyncio.get_running_loop().call_soon(manager.dispatch, make_message("|j|bar"))
+    await asyncio.sleep(0.01)
+
+    assert calls == ["foo", "bar"]
+
+
+async def test_expect_attributes():
+    manager = InboundMessageManager()
+    waiter = asyncio.create_task(manager.expect(JoinMessage, joined="bar"))
+    await asyncio.sleep(0)
+
+    manager.dispatch(make_message("|j|foo"))
+    manager.dispatch(make_message("|c|bar|hello"))
+    manager.dispatch(make_message("|j|bar"))
+
+    assert (await waiter).joined == "bar"
+    assert not manager.waiters
+
+
+async def test_expect_unhashable_attributes():
+    manager = InboundMessageManager()
+    waiter = asyncio.create_task(
+        manager.expect(QueryResponseMessage, result={"rooms": ["help"]})
+    )
+    await asyncio.sleep(0)
+
+    manager.dispatch(make_message('|queryresponse|rooms|{"rooms":["lobby"]}'))
+    manager.dispatch(make_message('|queryresponse|rooms|{"rooms":["help"]}'))
+
+    assert (await waiter).querytype == "rooms"
+    assert not manager.waiters
+
+
+async def test_expect_cancelled():
+    manager = InboundMessageManager()
+    waiter = asyncio.create_task(manager.expect(ChatMessage, room_id="help"))
+    await asyncio.sleep(0)
+
+    assert manager.waiters
+
+    waiter.cancel()
+    await asyncio.sleep(0)
+
+    assert not manager.waiters
+
+
+async def send_commands(manager, *commands):
+    sent = []
+    entered = asyncio.Event()
+
+    async def command(raw_message, key):
+        async with manager.append(raw_message, key=key):
+            if len(sent) == len(commands):
+                entered.set()
+            await entered.wait()
+
+    async def consume():
+        async for raw_message in manager.collect():
+            sent.append(raw_message)
+
+    consumer = asyncio.create_task(consume())
+    tasks = [asyncio.create_task(command(*args)) for args in commands]
+    await asyncio.sleep(0.05)
+    consumer.cancel()
+
+    for task in tasks:
+        task.cancel()
+
+    return sent
+
+
+async def test_outbound_serialized():
+    manager = OutboundMessageManager(messages_per_second=1000)
+    sent = await send_commands(manager, ("|/join a", None), ("|/join b", None))
+    assert sent == ["|/join a"]
+
+
+async def test_outbound_pipelined():
+    manager = OutboundMessageManager(messages_per_second=1000, pipelined=True)
+    sent = await send_commands(
+        manager,
+        ("a|hello", ("room", "a")),
+        ("b|hello", ("room", "b")),
+        ("a|bye", ("room", "a")),
+    )
+    assert sent == ["a|hello", "b|hello"]
+
+
+async def test_outbound_unfiltered_commands_exclusive():
+    manager = OutboundMessageManager(messages_per_second=1000, pipelined=True)
+    sent = await send_commands(
+        manager, ("|/join a", ("room", "a")), ("|/join b", ("room", "b"))
+    )
+    assert sent == ["|/join a"]
+
+
+async def test_outbound_batches():
+    manager = OutboundMessageManager(
+        messages_per_second=1000, burst=4, pipelined=True, batch_size=3
+    )
+    batches = []
+
+    async def command(raw_message, key):
+        async with manager.append(raw_message, key=key):
+            await asyncio.sleep(1)
+
+    async def consume():
+        async for batch in manager.collect_batches():
+            batches.append(batch)
+
+    tasks = [
+        asyncio.create_task(command(f"{room_id}|hello", ("room", room_id)))
+        for room_id in "abcd"
+    ]
+    await asyncio.sleep(0)
+
+    consumer = asyncio.create_task(consume())
+    await asyncio.sleep(0.05)
+
+    assert batches == [["a|hello", "b|hello", "c|hello"], ["d|hello"]]
+
+    for task in [consumer, *tasks]:
+        task.cancel()
+
+
+async def test_outbound_error_routing():
+    manager = OutboundMessageManager(messages_per_second=1000, pipelined=True)
+
+    async def command(raw_message, key):
+        async with manager.append(raw_message, key=key):
+            await asyncio.sleep(1)
+
+    async def consume():
+        async for raw_message in manager.collect():
+            pass
+
+    consumer = asyncio.create_task(consume())
+    tasks = [
+        asyncio.create_task(command("|/join a", ("room", "a"))),
+        asyncio.create_task(command("|/join b", ("room", "b"))),
+    ]
+    await asyncio.sleep(0.05)
+
+    manager.handle_message(make_message("|error|oops", ""))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ReceivedErrorMessage):
+        await tasks[0]
+    assert not tasks[1].done()
+
+    for task in [consumer, *tasks]:
+        task.cancel()
+
+
+async def test_outbound_error_after_slow_command():
+    inbound = InboundMessageManager()
+    outbound = OutboundMessageManager(messages_per_second=1000, pipelined=True)
+    sent = []
+
+    async def join(room_id):
+        async with outbound.append(f"|/join {room_id}", key=("room", room_id)):
+            return await inbound.expect(InitMessage, room_id=room_id)
+
+    async def consume():
+        async for raw_message in outbound.collect():
+            sent.append(raw_message)
+
+    def receive(raw_message, room_id=""):
+        message = make_message(raw_message, room_id)
+        outbound.handle_message(message)
+        inbound.dispatch(message)
+
+    consumer = asyncio.create_task(consume())
+    tasks = [asyncio.create_task(join(room_id)) for room_id in ["slow", "err", "fast"]]
+    await asyncio.sleep(0.05)
+    assert sent == ["|/join slow"]
+
+    receive("|init|chat", "slow")
+    await asyncio.sleep(0.05)
+    assert sent == ["|/join slow", "|/join err"]
+
+    receive("|error|nope")
+    await asyncio.sleep(0.05)
+    receive("|init|chat", "fast")
+
+    assert (await tasks[0]).roomtype == "chat"
+    with pytest.raises(ReceivedErrorMessage, match="nope"):
+        await tasks[1]
+    assert (await tasks[2]).roomtype == "chat"
+
+    consumer.cancel()
+
+
+async def test_outbound_error_filters():
+    manager = OutboundMessageManager(messages_per_second=1000, pipelined=True)
+
+    async def command(room_id):
+        async with manager.append(
+            f"|/join {room_id}",
+            key=("room", room_id),
+            error_filter=lambda message: room_id in message.error,
+        ):
+            await asyncio.sleep(1)
+
+    async def consume():
+        async for raw_message in manager.collect():
+            pass
+
+    consumer = asyncio.create_task(consume())
+    tasks = [asyncio.create_task(command(room_id)) for room_id in ["a", "b"]]
+    await asyncio.sleep(0.05)
+
+    manager.handle_message(make_message("|error|Couldn't join b", ""))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ReceivedErrorMessage):
+        await tasks[1]
+    assert not tasks[0].done()
+
+    for task in [consumer, *tasks]:
+        task.cancel()
+
+
+async def test_outbound_timeout():
+    manager = OutboundMessageManager(messages_per_second=1000, response_timeout=0.01)
+
+    async def command():
+        async with manager.append("|/join a"):
+            await asyncio.sleep(1)
+
+    async def consume():
+        async for raw_message in manager.collect():
+            pass
+
+    consumer = asyncio.create_task(consume())
+
+    with pytest.raises(ServerResponseTimeout):
+        await asyncio.wait_for(command(), 0.5)
+
+    assert not manager.in_flight
+    assert not manager.pending
+
+    consumer.cancel()
+
+
+async def test_outbound_answered_commands_retire():
+    inbound = InboundMessageManager()
+    outbound = OutboundMessageManager(messages_per_second=1000, pipelined=True)
+
+    async def command(raw_message, key, sender):
+        async with outbound.append(raw_message, key=key):
+            return await inbound.expect(ChatMessage, sender=sender)
+
+    async def consume():
+        async for raw_message in outbound.collect():
+            pass
+
+    consumer = asyncio.create_task(consume())
+    tasks = [
+        asyncio.create_task(command("|/pm a,hi", ("pm", "a"), "a")),
+        asyncio.create_task(command("|/pm b,hi", ("pm", "b"), "b")),
+    ]
+    await asyncio.sleep(0.05)
+
+    for raw_message in ["|c|a|hi", "|error|b failed"]:
+        message = make_message(raw_message, "")
+        outbound.handle_message(message)
+        inbound.dispatch(message)
+        await asyncio.sleep(0.05)
+
+    assert (await tasks[0]).sender == "a"
+    with pytest.raises(ReceivedErrorMessage, match="b failed"):
+        await tasks[1]
+    assert not outbound.in_flight
+
+    consumer.cancel()
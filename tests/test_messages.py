@@ -1,12 +1,16 @@
+from types import SimpleNamespace
+
 import pytest
 
 from pslib import (
     parse_message,
+    Message,
     UnrecognizedMessage,
     PlainTextMessage,
     UpdateUserMessage,
     InvalidMessageParameters,
 )
+from pslib.messages import compile_fields
 
 
 @pytest.mark.parametrize(
@@ -54,3 +58,105 @@ def test_update_user():
 def test_update_user_wrong_params():
     with pytest.raises(InvalidMessageParameters):
         parse_message("|updateuser| Guest 3642588|0|102")
+
+
+def test_lazy_hydration():
+    message = parse_message("|updateuser| Guest 3642588|0|102|{}", lazy=True)
+
+    assert not message.hydrated
+    assert message.userid == "guest3642588"
+    assert message.hydrated
+    assert message.settings == {}
+
+
+def test_lazy_wrong_params():
+    message = parse_message("|updateuser| Guest 3642588|0|102", lazy=True)
+    assert message.serialize() == "|updateuser| Guest 3642588|0|102"
+
+    with pytest.raises(InvalidMessageParameters):
+        message.userid
+
+    with pytest.raises(InvalidMessageParameters):
+        message.avatar
+
+
+@pytest.mark.parametrize(
+    "raw_message", ["|something|foo", "|deinit", "Hello, world!", "|c|foo|bar|baz"]
+)
+def test_parse_offsets(raw_message):
+    payload = f">lobby\n{raw_message}\n|j|foo"
+    start = payload.index("\n") + 1
+    end = start + len(raw_message)
+
+    assert parse_message(payload, start=start, end=end) == parse_message(raw_message)
+
+
+def unpack(fields, value, **options):
+    target = SimpleNamespace(value=value)
+    compile_fields("unpack_fields", fields, **options)(target)
+    return vars(target)
+
+
+def test_compile_single_field():
+    assert unpack([("content", str)], "foo|bar") == {
+        "value": "foo|bar",
+        "content": "foo|bar",
+    }
+
+
+def test_compile_last_field_takes_rest():
+    fields = [("sender", str), ("content", str)]
+    assert unpack(fields, "foo|bar|baz")["content"] == "bar|baz"
+
+
+def test_compile_count_mismatch():
+    with pytest.raises(InvalidMessageParameters, match="Expected 3 parameters"):
+        unpack([("a", str), ("b", str), ("c", int)], "foo|bar")
+
+
+def test_compile_optional_defaults():
+    fields = [("a", str), ("b", int, 0), ("c", str, "")]
+
+    assert unpack(fields, "foo") == {"value": "foo", "a": "foo", "b": 0, "c": ""}
+    assert unpack(fields, "foo|3|x|y")["c"] == "x|y"
+
+
+def test_compile_fewer_than_required():
+    with pytest.raises(InvalidMessageParameters, match="Expected 2 parameters"):
+        unpack([("a", str), ("b", str), ("c", str, "")], "foo")
+
+
+def test_compile_keyword_suffixes():
+    fields = [("pokemon", str), ("move", str, "")]
+    unpacked = unpack(fields, "p1a: Foo|Tackle|[from] item: Bar|[still]", keywords=True)
+
+    assert unpacked["move"] == "Tackle"
+    assert unpacked["keywords"] == {"from": "item: Bar", "still": ""}
+    assert "keywords" not in unpack(fields, "p1a: Foo|[still]")
+    assert unpack([("tier", str)], "[Gen 8] OU", keywords=True)["tier"] == "[Gen 8] OU"
+
+
+def test_compile_keyword_suffixes_last_field_takes_rest():
+    fields = [("pokemon", str), ("effect", str)]
+    unpacked = unpack(
+        fields,
+        "p2a: Foo|typechange|Fire|[from] ability: Color Change",
+        keywords=True,
+    )
+
+    assert unpacked["effect"] == "typechange|Fire"
+    assert unpacked["keywords"] == {"from": "ability: Color Change"}
+
+    fields = [("pokemon", str), ("effect", str, "")]
+    unpacked = unpack(fields, "p1a: Foo|move: Protect|extra", keywords=True)
+    assert unpacked["effect"] == "move: Protect|extra"
+
+
+def test_keyword_suffixes_are_opt_in():
+    class KeywordsSlotMessage(Message):
+        __slots__ = ("keywords",)
+
+        fields = [("name", str), ("note", str)]
+
+    message = KeywordsSlotMessage("test", "foo|[bar] baz")
+    assert message.note == "[bar] baz"
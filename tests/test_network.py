@@ -0,0 +1,76 @@
+import pytest
+import json
+import tracemalloc
+
+from pslib import InvalidPayloadFormat, ServerConnectionClosed
+from pslib.network import WebsocketContext
+
+
+STICKY_PAYLOAD = "a" + json.dumps(
+    [
+        "|updateuser| Guest 1|0|170|{}",
+        ">battle-gen8randombattle-1\n|init|battle\n|title|foo vs. bar\n|j|foo",
+        ">lobby\n|c|foo|hello\n\n|c|bar|world",
+        "|pm| Foo|~|/error nope",
+    ]
+)
+
+
+def decode(payload, sticky=True):
+    return [
+        (room_id, frame[start:end])
+        for room_id, frame, start, end in WebsocketContext(
+            None, sticky=sticky
+        ).decode_payload(payload)
+    ]
+
+
+def test_decode_all_frames():
+    assert decode(STICKY_PAYLOAD) == [
+        ("lobby", "|updateuser| Guest 1|0|170|{}"),
+        ("battle-gen8randombattle-1", "|init|battle"),
+        ("battle-gen8randombattle-1", "|title|foo vs. bar"),
+        ("battle-gen8randombattle-1", "|j|foo"),
+        ("lobby", "|c|foo|hello"),
+        ("lobby", "|c|bar|world"),
+        ("lobby", "|pm| Foo|~|/error nope"),
+    ]
+
+
+def test_decode_nonsticky():
+    assert decode(">help\n|j|foo\n|l|bar", sticky=False) == [
+        ("help", "|j|foo"),
+        ("help", "|l|bar"),
+    ]
+
+
+@pytest.mark.parametrize("payload", ["h", "o", "a[]"])
+def test_decode_empty_frames(payload):
+    assert decode(payload) == []
+
+
+def test_decode_close_frame():
+    with pytest.raises(ServerConnectionClosed):
+        decode('c[3000,"Go away!"]')
+
+
+@pytest.mark.parametrize("payload", ["x", "a[", 'a{"foo":1}', ""])
+def test_decode_invalid(payload):
+    with pytest.raises(InvalidPayloadFormat):
+        decode(payload)
+
+
+def test_decode_large_backlog_without_copies():
+    lines = [f"|c:|{1600000000 + i}|+user{i % 50}|message {i}" for i in range(5000)]
+    frame = ">lobby\n" + "\n".join(["|init|chat", *lines])
+    ws = WebsocketContext(None)
+
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in ws.decode_frame(frame))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert count == len(lines) + 1
+    assert peak < len(frame) // 20
@@ -0,0 +1,45 @@
+import pytest
+import asyncio
+
+from pslib import Client, ClientPool, parse_message
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_pool():
+    return ClientPool([Client(None, None), Client(None, None)])
+
+
+async def test_assign_by_load():
+    pool = make_pool()
+    rooms = [pool.room(f"battle-gen8ou-{i}") for i in range(4)]
+    owners = [room.client for room in rooms]
+
+    assert owners.count(pool.clients[0]) == 2
+    assert owners.count(pool.clients[1]) == 2
+
+
+async def test_route_to_owner():
+    pool = make_pool()
+    room = pool.room("battle-gen8ou-1")
+    other = pool.room("battle-gen8ou-2")
+
+    assert pool.room("battle-gen8ou-1") is room
+    assert pool.owner("battle-gen8ou-2") is other.client is not room.client
+
+
+async def test_merged_listen():
+    pool = make_pool()
+
+    async def receive():
+        async for message in pool.listen():
+            return message
+
+    listener = asyncio.create_task(receive())
+    await asyncio.sleep(0.01)
+
+    client = pool.clients[1]
+    client.received_messages.dispatch(parse_message("|j|foo", client.rooms["lobby"]))
+
+    assert (await listener).joined == "foo"
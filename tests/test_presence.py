@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+from pslib import parse_message
+from pslib.presence import PresenceIndex
+
+
+def feed(presence, room_id, *raw_messages):
+    room = SimpleNamespace(id=room_id)
+    for raw_message in raw_messages:
+        presence.handle_message(parse_message(raw_message, room))
+
+
+def test_snapshot_and_deltas():
+    presence = PresenceIndex()
+
+    feed(presence, "lobby", "|users|3,*Bot,@Mod, Foo", "|j| Bar", "|l|mod")
+    feed(presence, "help", "|users|1, Foo", "|n| Foo Bar|foo")
+
+    assert presence.users("lobby") == {"bot", "foo", "bar"}
+    assert presence.users("help") == {"foobar"}
+    assert presence.rooms("foo") == {"lobby"}
+    assert presence.rooms("foobar") == {"help"}
+    assert presence.rooms("mod") == set()
+
+
+def test_discard_room():
+    presence = PresenceIndex()
+
+    feed(presence, "lobby", "|users|2, Foo, Bar")
+    feed(presence, "help", "|users|1, Foo")
+    presence.discard_room("lobby")
+
+    assert presence.users("lobby") == set()
+    assert presence.rooms("foo") == {"help"}
+    assert "bar" not in presence.user_rooms
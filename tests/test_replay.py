@@ -0,0 +1,58 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from pslib import replay, capture_payloads, CaptureWriter, WinMessage, ChatMessage
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def battle_payloads():
+    with open(Path(__file__).parent / "data" / "battle.log", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    return [
+        (0.0, "o"),
+        (0.0, "a" + json.dumps(["|updateuser| Guest 1|0|170|{}"])),
+        (1.0, "a" + json.dumps([">battle-gen8ou-1\n" + "\n".join(lines[:40])])),
+        (2.0, "a" + json.dumps([">battle-gen8ou-1\n" + "\n".join(lines[40:])])),
+    ]
+
+
+async def test_replay_full_speed():
+    async with replay(battle_payloads(), demand_driven=True) as client:
+        listener = client.listen(WinMessage, all_rooms=True)
+        await client.ws.finished
+
+    room = client.rooms["battle-gen8ou-1"]
+    assert room.state.snapshot().turn == 4
+    assert (await listener.get()).userid == "bob"
+    assert (await client.state.user).userid == "guest1"
+
+
+async def test_replay_time_scaled():
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async with replay(battle_payloads(), speed=100) as client:
+        await client.ws.finished
+
+    assert loop.time() - start >= 0.02
+    assert client.rooms["battle-gen8ou-1"].state.finished
+
+
+async def test_replay_capture(tmp_path):
+    writer = CaptureWriter(tmp_path)
+    for i in range(100):
+        writer.write("lobby", f"|c|user{i % 3}|message {i}", float(i))
+    writer.close()
+
+    async with replay(capture_payloads(tmp_path), sticky=False) as client:
+        listener = client.listen(ChatMessage)
+        await client.ws.finished
+
+    assert listener.qsize() == 100
+    assert [message.content for message in listener.buffer][-1] == "message 99"
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from pslib import Client, parse_message
+from pslib.rooms import Room, RoomPolicy
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_client(**policy):
+    client = Client(None, None, room_policy=RoomPolicy(**policy))
+    left = []
+
+    async def leave(room):
+        left.append(room.id)
+        room.handle_leave()
+
+    client.rooms.room_class = type("TestRoom", (Room,), {"leave": leave})
+    return client, left
+
+
+def join(client, room_id, *raw_messages):
+    room = client.rooms[room_id]
+    room.handle_join()
+    for raw_message in raw_messages:
+        room.handle_message(parse_message(raw_message, room))
+    return room
+
+
+async def test_max_rooms_evicts_least_recently_active():
+    client, left = make_client(max_rooms=2, prefer_finished=False)
+
+    join(client, "a")
+    join(client, "b")
+    join(client, "a", "|c|foo|hello")
+    join(client, "c")
+    await asyncio.sleep(0)
+
+    assert left == ["b"]
+    assert set(client.rooms) == {"lobby", "a", "c"}
+
+
+async def test_finished_rooms_are_evicted_first():
+    client, left = make_client(max_rooms=2)
+    hooked = []
+    client.rooms.add_eviction_hook(lambda room: hooked.append(room.id))
+
+    join(client, "a")
+    join(client, "b", "|win|foo")
+    join(client, "c")
+    await asyncio.sleep(0)
+
+    assert hooked == left == ["b"]
+
+
+async def test_log_size_cap():
+    client, left = make_client(max_log_size=20)
+
+    join(client, "a", "|c|foo|" + "x" * 15)
+    join(client, "b", "|c|foo|hello")
+    client.rooms.enforce()
+    await asyncio.sleep(0)
+
+    assert left == ["a"]
+    assert client.rooms["b"].state.logs.size == len("foo|hello")
+
+
+async def test_discover_battles(monkeypatch):
+    client = Client(None, None)
+    results = iter([["a", "b"], ["a", "b"], ["b", "c"], ["c"], ["a"], ["b", "d"]])
+    delays = []
+
+    async def query_battles(*args):
+        return [client.rooms[f"battle-{battle_id}"] for battle_id in next(results)]
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(client, "query_battles", query_battles)
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+
+    discovered = []
+    async for battle in client.discover_battles(interval=1, max_interval=3):
+        discovered.append(battle.id)
+        if len(discovered) == 4:
+            break
+
+    assert discovered == ["battle-a", "battle-b", "battle-c", "battle-d"]
+    assert delays == [1, 2, 1, 2, 3]
@@ -0,0 +1,53 @@
+import pytest
+
+from pslib import Client, parse_message, ChatMessage
+from pslib.state import RoomState
+
+
+pytestmark = pytest.mark.asyncio
+
+LINES = ["|c|foo|hello", "", "|j|bar", "|title|Lobby"]
+
+
+async def test_raw_logs():
+    state = RoomState(maxlogs=3, raw_logs=True)
+
+    for line in LINES:
+        state.handle_message(parse_message(line))
+
+    assert len(state.logs) == 3
+    assert state.logs.serialize() == "|\n|j|bar\n|title|Lobby"
+    assert [message.type for message in state.logs] == ["", "j", "title"]
+
+
+async def test_raw_logs_materialize():
+    state = RoomState(raw_logs=True)
+    state.handle_message(parse_message("|c|foo|hello"))
+
+    message = next(iter(state.logs))
+    assert isinstance(message, ChatMessage)
+    assert message.content == "hello"
+
+
+async def test_logs_keep_room():
+    client = Client(None, None, raw_logs=True)
+    client.skip_message("|b|battle-gen8ou-1|foo|bar")
+    client.handle_message(parse_message("|c|foo|hello", client))
+
+    messages = list(client.state.logs)
+    assert all(message.room is client for message in messages)
+    assert messages[0].battle is client.rooms["battle-gen8ou-1"]
+
+
+async def test_skipped_lines_keep_room():
+    client = Client(None, None)
+    room = client.rooms["help"]
+    room.skip_message("|c|foo|hello")
+
+    message = room.state.logs[-1]
+    assert not message.hydrated
+    assert message.room is room
+    assert message.content == "hello"
+
+    room.reset_state()
+    assert room.state.logs.room is room
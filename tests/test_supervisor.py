@@ -0,0 +1,134 @@
+import pytest
+import asyncio
+from contextlib import asynccontextmanager
+from multiprocessing import Pipe
+from threading import Thread
+
+from pslib import (
+    Client,
+    ClientSupervisor,
+    JoinMessage,
+    JoiningRoomFailed,
+    ServerConnectionClosed,
+    parse_message,
+)
+from pslib.supervisor import WORKER_COMMANDS, WorkerHandle, receive, serve_worker
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def fake_worker(connection):
+    while (request := connection.recv())[0] != "stop":
+        name, request_id, (room_id,) = request
+
+        if room_id == "inexistant":
+            error = JoiningRoomFailed(f"Couldn't join room {room_id}")
+            connection.send(("result", request_id, None, error))
+        elif room_id == "closed":
+            break
+        else:
+            connection.send(("lines", [(room_id, "|init|chat"), (room_id, "|j|foo")]))
+            connection.send(("result", request_id, room_id, None))
+
+    connection.close()
+
+
+async def run_supervisor(main):
+    connection, worker_connection = Pipe()
+    thread = Thread(target=fake_worker, args=(worker_connection,))
+    thread.start()
+
+    worker = WorkerHandle(None, connection)
+
+    try:
+        async with ClientSupervisor([worker]).start() as supervisor:
+            return await main(supervisor)
+    finally:
+        worker.stop()
+        thread.join()
+
+
+async def test_forwarded_messages():
+    async def main(supervisor):
+        listener = asyncio.create_task(supervisor.expect(JoinMessage, all_rooms=True))
+        await asyncio.sleep(0)
+
+        room = await supervisor.join("help")
+        message = await listener
+
+        assert room.joined
+        assert message.room is room
+        assert message.joined == "foo"
+
+    await run_supervisor(main)
+
+
+async def test_forwarded_errors():
+    async def main(supervisor):
+        with pytest.raises(JoiningRoomFailed):
+            await supervisor.join("inexistant")
+
+    await run_supervisor(main)
+
+
+async def test_closed_worker():
+    async def main(supervisor):
+        with pytest.raises(ServerConnectionClosed):
+            await supervisor.join("closed")
+        with pytest.raises(ServerConnectionClosed):
+            await supervisor.join("help")
+
+    await run_supervisor(main)
+
+
+async def test_serve_worker(monkeypatch):
+    @asynccontextmanager
+    async def connect(**kwargs):
+        yield Client(None, None)
+
+    async def join(client, room_id):
+        if room_id == "broken":
+            raise RuntimeError(room_id)
+        room = client.rooms[room_id]
+        client.received_messages.dispatch(parse_message("|j|foo", room))
+        return room_id
+
+    monkeypatch.setattr(Client, "connect", connect)
+    monkeypatch.setitem(WORKER_COMMANDS, "join", join)
+
+    connection, worker_connection = Pipe()
+    worker = asyncio.create_task(
+        serve_worker(worker_connection, (JoinMessage,), None, {})
+    )
+
+    connection.send(("join", 0, ("help",)))
+    replies = [await receive(connection), await receive(connection)]
+    assert sorted(replies) == [
+        ("lines", [("help", "|j|foo")]),
+        ("result", 0, "help", None),
+    ]
+
+    connection.send(("join", 1, ("broken",)))
+    kind, request_id, result, error = await receive(connection)
+    assert (kind, request_id, result) == ("result", 1, None)
+    assert isinstance(error, RuntimeError)
+
+    connection.send(("stop",))
+    await asyncio.wait_for(worker, 1)
+
+
+async def test_receive_without_add_reader(monkeypatch):
+    loop = asyncio.get_running_loop()
+
+    def add_reader(fd, callback):
+        raise NotImplementedError
+
+    monkeypatch.setattr(loop, "add_reader", add_reader)
+
+    connection, worker_connection = Pipe()
+    receiving = asyncio.create_task(receive(connection))
+    await asyncio.sleep(0.01)
+
+    worker_connection.send(("result", 0, "help", None))
+    assert await asyncio.wait_for(receiving, 1) == ("result", 0, "help", None)
@@ -0,0 +1,71 @@
+import pytest
+import asyncio
+import re
+
+from pslib.utils import TokenBucket, DeadlineScheduler, into_id
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.mark.parametrize(
+    "string",
+    [
+        " Guest 3642588",
+        "@Some_User!",
+        "abc123",
+        "",
+        "__",
+        "Zarel",
+        "Pokémon Trainer",
+        "İstanbul",
+        "ＡＢＣ１２３",
+        "ß-Straße",
+        "日本語 ユーザー",
+        "Ǆemal",
+        "x\u0301y",
+    ],
+)
+async def test_into_id(string):
+    expected = re.sub(r"(\W|_)", "", string.lower())
+    assert into_id(string) == expected
+    assert into_id(string) is into_id(string)
+
+
+async def test_token_bucket_burst():
+    bucket = TokenBucket(10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() > 0
+
+
+async def test_token_bucket_acquire():
+    bucket = TokenBucket(100, burst=1)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    for _ in range(3):
+        await bucket.acquire()
+
+    assert loop.time() - start >= 0.015
+
+
+async def test_token_bucket_throttle():
+    bucket = TokenBucket(20, burst=6)
+    bucket.throttle()
+
+    assert bucket.rate == 10
+    assert bucket.budget < 1
+
+
+async def test_deadline_scheduler():
+    scheduler = DeadlineScheduler()
+    calls = []
+
+    scheduler.schedule(0.02, calls.append, "b")
+    scheduler.schedule(0.01, calls.append, "a")
+    scheduler.cancel(scheduler.schedule(0.015, calls.append, "cancelled"))
+
+    await asyncio.sleep(0.05)
+
+    assert calls == ["a", "b"]
+    assert not scheduler.heap